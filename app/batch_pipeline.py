@@ -0,0 +1,145 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from app.coincidence_calculator import CoincidenceCalculator
+from app.file_handler import FileHandler, FileWriter
+from app.impulse_calculator import ImpulseCalculator
+from app.instrumentation import Instrumentation
+from app.log_organizer import LogOrganizer, LogOrganizerDataExporter
+from app.log_splitter import LogSplitter
+
+
+class BatchPipeline:
+
+    class BatchPipelineError(Exception):
+        pass
+
+    EXIT_SUCCESS = 0
+    EXIT_FAILURE = 1
+    _ERRORS = (LogOrganizer.LogOrganizerError, LogSplitter.LogSplitterError,
+               ImpulseCalculator.ImpulseCalculatorError, CoincidenceCalculator.CoincidenceCalculatorError, OSError)
+
+    def __init__(self, organize_intervals, split_interval=None, split_dates=None, impulses=False, coincidences=False,
+                 workers=1, compression=None, compression_level=None, compression_buffer_size=None, binary=False,
+                 fsync=True, sort_raw_logs=False, sort_memory_budget=None, split_percentiles=tuple()):
+        if len(organize_intervals) == 0:
+            raise BatchPipeline.BatchPipelineError("no time intervals to organize logs with")
+        if split_interval is not None and split_dates is not None:
+            raise BatchPipeline.BatchPipelineError("logs can be split either by time interval or by dates")
+        if (impulses or coincidences) and split_interval is None:
+            raise BatchPipeline.BatchPipelineError("impulses can only be calculated for logs split by time interval")
+        if binary and compression is not None:
+            raise BatchPipeline.BatchPipelineError("split logs can be either binary or compressed")
+        self._organize_intervals = sorted(set(organize_intervals))
+        self._split_interval = split_interval
+        self._split_dates = split_dates
+        self._impulses = impulses or coincidences
+        self._coincidences = coincidences
+        self._workers = workers if workers is not None else os.cpu_count()
+        self._compression = compression
+        self._compression_level = compression_level
+        self._compression_buffer_size = compression_buffer_size
+        self._binary = binary
+        self._fsync = fsync
+        self._sort_raw_logs = sort_raw_logs
+        self._sort_memory_budget = sort_memory_budget
+        self._split_percentiles = tuple(split_percentiles)
+        self._instrumentation_options = Instrumentation.get_options()
+        self._failures = dict()
+
+    @property
+    def failures(self):
+        return self._failures
+
+    def run(self, nodes):
+        self._failures = dict()
+        self._instrumentation_options = Instrumentation.get_options()
+        self._set_file_options()
+        node_names = [node_name for node_name, _ in nodes]
+        if len(set(node_names)) != len(node_names):
+            raise BatchPipeline.BatchPipelineError("node names must be unique")
+        if self._workers > 1 and len(nodes) > 1:
+            with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                results = list(executor.map(self._run_node_pipeline, node_names, [file for _, file in nodes]))
+        else:
+            results = [self._run_node_pipeline(node_name=node_name, filename=file) for node_name, file in nodes]
+        for node_name, (error, measurements) in zip(node_names, results):
+            Instrumentation.add_measurements(measurements=measurements)
+            if error is not None:
+                self._failures[node_name] = error
+        if self._coincidences:
+            self._calculate_coincidences(node_names=[node_name for node_name in node_names
+                                                     if node_name not in self._failures])
+        if len(self._failures) > 0:
+            return BatchPipeline.EXIT_FAILURE
+        return BatchPipeline.EXIT_SUCCESS
+
+    def get_impulse_directory(self, node_name):
+        return "data/" + node_name + "/" + LogSplitter.get_interval_directory_name(
+            time_interval_in_seconds=self._split_interval)
+
+    def _set_file_options(self):
+        Instrumentation.configure(**self._instrumentation_options)
+        FileWriter.fsync = self._fsync
+        if self._compression_level is not None:
+            FileHandler.compression_level = self._compression_level
+        if self._compression_buffer_size is not None:
+            FileHandler.compression_buffer_size = self._compression_buffer_size
+
+    def _run_node_pipeline(self, node_name, filename):
+        self._set_file_options()
+        number_of_measurements = Instrumentation.get_number_of_measurements()
+        error = None
+        try:
+            with Instrumentation.measure_stage("node", node=node_name, file=filename):
+                self._run_node_stages(node_name=node_name, filename=filename)
+        except BatchPipeline._ERRORS as e:
+            error = str(e)
+        except Exception as e:
+            error = "unexpected {}: {}".format(type(e).__name__, e)
+        return error, Instrumentation.pop_measurements(start=number_of_measurements)
+
+    def _run_node_stages(self, node_name, filename):
+        self._organize(node_name=node_name, filename=filename)
+        if self._split_interval is not None or self._split_dates is not None:
+            self._split(node_name=node_name)
+        if self._impulses:
+            calculator = ImpulseCalculator()
+            calculator.calculate_impulses_in_directory(file_path=self.get_impulse_directory(node_name=node_name))
+            calculator.parse_impulse_data_in_directory(file_path=self.get_impulse_directory(node_name=node_name))
+
+    def _organize(self, node_name, filename):
+        organizer = LogOrganizer()
+        filenames = list(filename) if isinstance(filename, (list, tuple)) else [filename]
+        if self._sort_raw_logs or len(filenames) > 1:
+            organizer.organize_logs(filenames=filenames, node_name=node_name,
+                                    time_intervals_sec=self._organize_intervals, memory_budget=self._sort_memory_budget)
+        else:
+            organizer.organize_log_intervals(filename=filenames[0], node_name=node_name,
+                                             time_intervals_sec=self._organize_intervals)
+
+    def _split(self, node_name):
+        organized_filename = LogOrganizerDataExporter.get_file_name(node_name=node_name,
+                                                                    time_interval_sec=self._organize_intervals[0])
+        splitter = LogSplitter(data_file=organized_filename, print_avg_and_max=True, first_column_avg=2,
+                               last_column_avg=3, first_column_max=4, last_column_max=5,
+                               compression=self._compression, binary=self._binary,
+                               percentiles=self._split_percentiles)
+        if self._split_interval is not None:
+            splitter.split_log(time_interval_in_seconds=self._split_interval)
+        else:
+            splitter.split_log(start_date=self._split_dates[0], end_date=self._split_dates[1])
+
+    def _calculate_coincidences(self, node_names):
+        if len(node_names) < 2:
+            self._failures["coincidences"] = "at least two processed nodes are needed to calculate coincidences"
+            return
+        calculator = CoincidenceCalculator(workers=self._workers)
+        try:
+            calculator.calculate_coincidence_matrix(file_paths=[self.get_impulse_directory(node_name=node_name)
+                                                                for node_name in node_names],
+                                                    time_interval=self._organize_intervals[0])
+        except BatchPipeline._ERRORS as e:
+            self._failures["coincidences"] = str(e)
+        except Exception as e:
+            self._failures["coincidences"] = "unexpected {}: {}".format(type(e).__name__, e)
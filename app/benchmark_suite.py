@@ -0,0 +1,203 @@
+import contextlib
+import datetime
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.coincidence_calculator import CoincidenceCalculator
+from app.file_handler import FileWriter
+from app.impulse_calculator import ImpulseCalculator
+from app.log_organizer import LogOrganizer, LogOrganizerDataExporter
+from app.log_splitter import LogSplitter
+from app.traffic_log_generator import TrafficLogGenerator
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class BenchmarkSuite:
+
+    class BenchmarkSuiteError(Exception):
+        pass
+
+    VERSION = 1
+    STAGES = ("organize", "organize_streaming", "split", "impulses", "coincidences")
+
+    def __init__(self, sizes, number_of_nodes=2, stages=STAGES, time_interval_sec=300, split_interval_sec=86400,
+                 generator=None, directory=None, super_linear_exponent=1.2):
+        if len(sizes) == 0:
+            raise BenchmarkSuite.BenchmarkSuiteError("no log sizes to benchmark")
+        for stage in stages:
+            if stage not in BenchmarkSuite.STAGES:
+                raise BenchmarkSuite.BenchmarkSuiteError("unknown stage: {}".format(stage))
+        if "split" in stages and "organize" not in stages and "organize_streaming" not in stages:
+            raise BenchmarkSuite.BenchmarkSuiteError("logs can only be split after organizing them")
+        if "impulses" in stages and "split" not in stages or "coincidences" in stages and "impulses" not in stages:
+            raise BenchmarkSuite.BenchmarkSuiteError("impulses and coincidences need the stages preceding them")
+        if "coincidences" in stages and number_of_nodes < 2:
+            raise BenchmarkSuite.BenchmarkSuiteError("at least two nodes are needed to benchmark coincidences")
+        self._sizes = sorted(set(sizes))
+        self._number_of_nodes = number_of_nodes
+        self._stages = [stage for stage in BenchmarkSuite.STAGES if stage in stages]
+        self._time_interval_sec = time_interval_sec
+        self._split_interval_sec = split_interval_sec
+        if generator is None:
+            generator = TrafficLogGenerator(time_interval_sec=time_interval_sec)
+        self._generator = generator
+        self._directory = directory
+        self._super_linear_exponent = super_linear_exponent
+        self._results = None
+
+    @property
+    def results(self):
+        return self._results
+
+    def run(self):
+        runs = list()
+        for number_of_rows in self._sizes:
+            runs.append(self._run_size(number_of_rows=number_of_rows))
+        self._results = {"version": BenchmarkSuite.VERSION,
+                         "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                         "python": platform.python_version(), "platform": platform.platform(),
+                         "nodes": self._number_of_nodes, "time_interval_sec": self._time_interval_sec,
+                         "split_interval_sec": self._split_interval_sec, "runs": runs,
+                         "scaling": BenchmarkSuite.get_scaling(runs=runs, stages=self._stages,
+                                                               super_linear_exponent=self._super_linear_exponent)}
+        return self._results
+
+    def _run_size(self, number_of_rows):
+        directory = tempfile.mkdtemp(prefix="benchmark_{}_".format(number_of_rows), dir=self._directory)
+        try:
+            start_time = time.perf_counter()
+            nodes = self._generator.write_node_logs(directory=directory, number_of_rows=number_of_rows,
+                                                    number_of_nodes=self._number_of_nodes)
+            stages = {"generate": {"time_sec": time.perf_counter() - start_time, "peak_memory_kb": None}}
+            for stage in self._stages:
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    elapsed_sec, peak_memory_kb = executor.submit(
+                        BenchmarkSuite._run_stage_in_process, stage, directory, [name for name, _ in nodes],
+                        [os.path.basename(filename) for _, filename in nodes], self._time_interval_sec,
+                        self._split_interval_sec).result()
+                stages[stage] = {"time_sec": elapsed_sec, "peak_memory_kb": peak_memory_kb,
+                                 "rows_per_sec": number_of_rows * self._number_of_nodes / elapsed_sec
+                                 if elapsed_sec > 0 else None}
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        return {"rows": number_of_rows, "stages": stages}
+
+    @staticmethod
+    def _run_stage_in_process(stage, directory, node_names, filenames, time_interval_sec, split_interval_sec):
+        os.chdir(directory)
+        start_time = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if stage == "coincidences":
+                calculator = CoincidenceCalculator()
+                calculator.calculate_coincidence_matrix(
+                    file_paths=[BenchmarkSuite._get_split_directory(node_name=node_name,
+                                                                    split_interval_sec=split_interval_sec)
+                                for node_name in node_names], time_interval=time_interval_sec)
+            else:
+                for node_name, filename in zip(node_names, filenames):
+                    BenchmarkSuite._run_node_stage(stage=stage, node_name=node_name, filename=filename,
+                                                   time_interval_sec=time_interval_sec,
+                                                   split_interval_sec=split_interval_sec)
+        elapsed_sec = time.perf_counter() - start_time
+        return elapsed_sec, BenchmarkSuite._get_peak_memory_kb()
+
+    @staticmethod
+    def _run_node_stage(stage, node_name, filename, time_interval_sec, split_interval_sec):
+        organized_filename = LogOrganizerDataExporter.get_file_name(node_name=node_name,
+                                                                    time_interval_sec=time_interval_sec)
+        if stage == "organize":
+            organizer = LogOrganizer()
+            organizer.organize_log(filename=filename, node_name=node_name, time_interval_sec=time_interval_sec)
+            LogOrganizerDataExporter.export_data(log_organizer=organizer)
+        elif stage == "organize_streaming":
+            organizer = LogOrganizer()
+            organizer.organize_log_intervals(filename=filename, node_name=node_name,
+                                             time_intervals_sec=[time_interval_sec])
+        elif stage == "split":
+            splitter = LogSplitter(data_file=organized_filename, print_avg_and_max=True, first_column_avg=2,
+                                   last_column_avg=3, first_column_max=4, last_column_max=5)
+            splitter.split_log(time_interval_in_seconds=split_interval_sec)
+        elif stage == "impulses":
+            split_directory = BenchmarkSuite._get_split_directory(node_name=node_name,
+                                                                  split_interval_sec=split_interval_sec)
+            calculator = ImpulseCalculator()
+            calculator.calculate_impulses_in_directory(file_path=split_directory)
+            calculator.parse_impulse_data_in_directory(file_path=split_directory)
+
+    @staticmethod
+    def _get_split_directory(node_name, split_interval_sec):
+        return "data/" + node_name + "/" + LogSplitter.get_interval_directory_name(
+            time_interval_in_seconds=split_interval_sec)
+
+    @staticmethod
+    def _get_peak_memory_kb():
+        if resource is None:
+            return None
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            peak_memory //= 1024
+        return peak_memory
+
+    @staticmethod
+    def get_scaling(runs, stages, super_linear_exponent=1.2):
+        scaling = dict()
+        for stage in stages:
+            steps = list()
+            for previous_run, run in zip(runs, runs[1:]):
+                previous_time = previous_run["stages"][stage]["time_sec"]
+                current_time = run["stages"][stage]["time_sec"]
+                if previous_time <= 0 or current_time <= 0:
+                    continue
+                exponent = math.log(current_time / previous_time) / math.log(run["rows"] / previous_run["rows"])
+                steps.append({"from_rows": previous_run["rows"], "to_rows": run["rows"], "exponent": exponent,
+                              "super_linear": exponent > super_linear_exponent})
+            scaling[stage] = steps
+        return scaling
+
+    @staticmethod
+    def get_super_linear_stages(results):
+        return sorted({stage for stage, steps in results["scaling"].items()
+                       for step in steps if step["super_linear"]})
+
+    @staticmethod
+    def compare_results(baseline, results, tolerance=0.1):
+        baseline_runs = {run["rows"]: run["stages"] for run in baseline["runs"]}
+        differences = list()
+        for run in results["runs"]:
+            baseline_stages = baseline_runs.get(run["rows"])
+            if baseline_stages is None:
+                continue
+            for stage, measurement in run["stages"].items():
+                if stage not in baseline_stages or baseline_stages[stage]["time_sec"] <= 0:
+                    continue
+                ratio = measurement["time_sec"] / baseline_stages[stage]["time_sec"]
+                if abs(ratio - 1) > tolerance:
+                    differences.append({"rows": run["rows"], "stage": stage,
+                                         "baseline_time_sec": baseline_stages[stage]["time_sec"],
+                                         "time_sec": measurement["time_sec"], "ratio": ratio})
+        return differences
+
+    def save_results(self, filename):
+        if self._results is None:
+            raise BenchmarkSuite.BenchmarkSuiteError("no benchmark results to save")
+        with FileWriter(filename=filename) as writer:
+            writer.write_bytes(data=json.dumps(self._results, indent=2).encode())
+
+    @staticmethod
+    def load_results(filename):
+        try:
+            with open(filename, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            raise BenchmarkSuite.BenchmarkSuiteError("benchmark results: {} could not be read: {}".format(filename, e))
@@ -0,0 +1,170 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from app.data_handler import DataHandler
+
+
+class BinaryLog:
+
+    class BinaryLogError(Exception):
+        pass
+
+    EXTENSION = ".tlb"
+    _MAGIC = b"TLCB"
+    _VERSION = 1
+    _HEADER = struct.Struct("<4sIqIIQI")
+    _ITEM_SIZE = 8
+
+    def __init__(self, timestamps, columns, header=None, summary=None, time_interval_sec=0, node_name=""):
+        self._timestamps = timestamps
+        self._columns = columns
+        self._header = header if header is not None else list()
+        self._summary = summary if summary is not None else list()
+        self._time_interval_sec = time_interval_sec
+        self._node_name = node_name
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    @property
+    def timestamps(self):
+        return self._timestamps
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @property
+    def header(self):
+        return self._header
+
+    @property
+    def summary(self):
+        return self._summary
+
+    @property
+    def time_interval_sec(self):
+        return self._time_interval_sec
+
+    @property
+    def node_name(self):
+        return self._node_name
+
+    @staticmethod
+    def is_binary_log(filename):
+        try:
+            with open(filename, "rb") as file:
+                return file.read(len(BinaryLog._MAGIC)) == BinaryLog._MAGIC
+        except OSError:
+            return False
+
+    @staticmethod
+    def read(filename, use_mmap=True):
+        with open(filename, "rb") as file:
+            if use_mmap and sys.byteorder == "little" and os.fstat(file.fileno()).st_size > 0:
+                data = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+            else:
+                data = memoryview(file.read())
+        try:
+            magic, version, time_interval_sec, number_of_columns, node_name_length, number_of_rows, \
+                metadata_length = BinaryLog._HEADER.unpack_from(data)
+        except struct.error:
+            raise BinaryLog.BinaryLogError("file: {} is too short to be a binary log".format(filename))
+        if magic != BinaryLog._MAGIC or version != BinaryLog._VERSION:
+            raise BinaryLog.BinaryLogError("file: {} is not a binary log of version {}".format(filename,
+                                                                                              BinaryLog._VERSION))
+        offset = BinaryLog._HEADER.size
+        node_name = bytes(data[offset:offset + node_name_length]).decode()
+        offset += node_name_length
+        typecodes = bytes(data[offset:offset + number_of_columns]).decode()
+        offset += number_of_columns
+        metadata = json.loads(bytes(data[offset:offset + metadata_length]).decode())
+        offset = BinaryLog._align(offset=offset + metadata_length)
+        if len(data) < offset + number_of_columns * number_of_rows * BinaryLog._ITEM_SIZE:
+            raise BinaryLog.BinaryLogError("file: {} is truncated".format(filename))
+        values = list()
+        for typecode in typecodes:
+            end = offset + number_of_rows * BinaryLog._ITEM_SIZE
+            values.append(BinaryLog._read_column(data=data[offset:end], typecode=typecode))
+            offset = end
+        return BinaryLog(timestamps=values[0], columns=values[1:], header=metadata["header"],
+                         summary=metadata["summary"], time_interval_sec=time_interval_sec, node_name=node_name)
+
+    @staticmethod
+    def _read_column(data, typecode):
+        if isinstance(data.obj, mmap.mmap):
+            return MappedColumn(values=data.cast(typecode), typecode=typecode)
+        values = array(typecode)
+        values.frombytes(data)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    @staticmethod
+    def _align(offset):
+        return (offset + BinaryLog._ITEM_SIZE - 1) // BinaryLog._ITEM_SIZE * BinaryLog._ITEM_SIZE
+
+    def write_to(self, writer):
+        columns = [self._timestamps] + list(self._columns)
+        typecodes = "".join("q" if column.typecode == "q" else "d" for column in columns).encode()
+        node_name = self._node_name.encode()
+        metadata = json.dumps({"header": [[str(value) for value in entry] for entry in self._header],
+                               "summary": [[str(value) for value in entry] for entry in self._summary]}).encode()
+        offset = BinaryLog._HEADER.size + len(node_name) + len(typecodes) + len(metadata)
+        writer.write_bytes(data=BinaryLog._HEADER.pack(BinaryLog._MAGIC, BinaryLog._VERSION, self._time_interval_sec,
+                                                       len(columns), len(node_name), len(self._timestamps),
+                                                       len(metadata)) + node_name + typecodes + metadata +
+                           bytes(BinaryLog._align(offset=offset) - offset), lines_written=len(self._timestamps))
+        for typecode, column in zip(typecodes.decode(), columns):
+            if not isinstance(column, array) or column.typecode != typecode or sys.byteorder != "little":
+                column = array(typecode, column)
+                if sys.byteorder != "little":
+                    column.byteswap()
+            writer.write_bytes(data=column)
+
+    def iterate_lines(self):
+        for entry in self._header:
+            yield ";".join(entry)
+        for idx in range(len(self._timestamps)):
+            yield ";".join([str(self._timestamps[idx])] + [DataHandler.format_value(value=column[idx])
+                                                          for column in self._columns])
+        for entry in self._summary:
+            yield ";".join(entry)
+
+    @staticmethod
+    def get_time_interval(timestamps):
+        if len(timestamps) < 2:
+            return 0
+        return timestamps[1] - timestamps[0]
+
+
+class MappedColumn:
+
+    def __init__(self, values, typecode):
+        self._values = values
+        self._typecode = typecode
+
+    @property
+    def typecode(self):
+        return self._typecode
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return MappedColumn(values=self._values[idx], typecode=self._typecode)
+        return self._values[idx]
+
+    def tofile(self, file):
+        file.write(self._values)
+
+    def __reduce__(self):
+        return array, (self._typecode, self._values.tolist())
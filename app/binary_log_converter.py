@@ -0,0 +1,44 @@
+from app.binary_log import BinaryLog
+from app.file_handler import FileHandler
+from app.traffic_log import TrafficLog, TrafficLogParser
+
+
+class BinaryLogConverter:
+
+    class BinaryLogConverterError(Exception):
+        pass
+
+    @staticmethod
+    def convert_to_binary(filename, binary_filename=None, time_interval_sec=None, node_name=None):
+        if binary_filename is None:
+            binary_filename = FileHandler.strip_compression(filename=filename).rsplit(sep=".", maxsplit=1)[0] \
+                              + BinaryLog.EXTENSION
+        try:
+            traffic_log = TrafficLogParser.parse_lines(lines=FileHandler.iterate_data_from_file(filename=filename),
+                                                       raw_metadata=True)
+        except FileNotFoundError:
+            raise BinaryLogConverter.BinaryLogConverterError("file: {} does not exist".format(filename))
+        except TrafficLog.TrafficLogError as e:
+            raise BinaryLogConverter.BinaryLogConverterError("file: {} could not be parsed: {}".format(filename, e))
+        if time_interval_sec is None:
+            time_interval_sec = BinaryLog.get_time_interval(timestamps=traffic_log.timestamps)
+        if node_name is None:
+            node_name = filename.rsplit(sep="/", maxsplit=2)[-2] if filename.count("/") > 0 else ""
+        binary_log = BinaryLog(timestamps=traffic_log.timestamps, columns=traffic_log.columns,
+                               header=traffic_log.header, summary=traffic_log.summary,
+                               time_interval_sec=time_interval_sec, node_name=node_name)
+        FileHandler.write_binary_log_to_file(binary_log=binary_log, filename=binary_filename)
+        return binary_filename
+
+    @staticmethod
+    def convert_to_csv(binary_filename, filename=None):
+        if filename is None:
+            filename = binary_filename.rsplit(sep=".", maxsplit=1)[0] + ".csv"
+        try:
+            binary_log = BinaryLog.read(filename=binary_filename)
+        except FileNotFoundError:
+            raise BinaryLogConverter.BinaryLogConverterError("file: {} does not exist".format(binary_filename))
+        except BinaryLog.BinaryLogError as e:
+            raise BinaryLogConverter.BinaryLogConverterError(str(e))
+        FileHandler.write_data_to_file(data=binary_log.iterate_lines(), filename=filename)
+        return filename
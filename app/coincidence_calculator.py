@@ -1,11 +1,26 @@
 import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
 
-from app.file_handler import FileHandler
+from app.data_handler import DataHandler
+from app.file_handler import FileWriter
+from app.impulse_calculator import ImpulseFileParser
+from app.instrumentation import Instrumentation
+from app.traffic_log import TrafficLog
 
 
 class CoincidenceCalculator:
 
-    def __init__(self):
+    class CoincidenceCalculatorError(Exception):
+        pass
+
+    _nodes_in_process = None
+
+    def __init__(self, use_mmap=False, workers=1, cache=None):
+        self._use_mmap = use_mmap
+        self._cache = cache
+        self._workers = workers if workers is not None else os.cpu_count()
         self._node_a_data = tuple()
         self._node_b_data = tuple()
         self._files = list()
@@ -17,18 +32,75 @@ class CoincidenceCalculator:
         self._node_a_name = None
         self._node_b_name = None
         self._coincidence_data = tuple()
+        self._coincidence_summary = tuple()
 
     def calculate_coincidences(self, file_path_node_a, file_path_node_b, time_interval):
         self._time_interval = time_interval
-        self._get_file_names_from_path(file_path=file_path_node_a)
-        self._node_a_name = self._files[0].rsplit(sep="/", maxsplit=1)[0]
-        self._node_a_data = self._get_impulse_data()
-        self._get_file_names_from_path(file_path=file_path_node_b)
-        self._node_b_name = self._files[0].rsplit(sep="/", maxsplit=1)[0]
-        self._node_b_data = self._get_impulse_data()
-        self._get_starting_points()
-        self._calculate_coincidences()
-        self._create_coincidence_file()
+        with Instrumentation.measure_stage("coincidences", node_a=file_path_node_a, node_b=file_path_node_b,
+                                           time_interval=time_interval):
+            node_a = self._load_node(file_path=file_path_node_a)
+            node_b = self._load_node(file_path=file_path_node_b)
+            self._calculate_node_pair_coincidences(node_a=node_a, node_b=node_b)
+
+    def calculate_coincidences_for_impulse_data(self, node_a, node_b, time_interval, write_file=True):
+        self._time_interval = time_interval
+        self._calculate_node_pair_coincidences(node_a=node_a, node_b=node_b, write_file=write_file)
+        return self._coincidence_data
+
+    def calculate_coincidence_matrix(self, file_paths, time_interval):
+        if len(file_paths) < 2:
+            raise CoincidenceCalculator.CoincidenceCalculatorError("at least two node paths are needed to calculate "
+                                                                   "coincidence matrix")
+        self._time_interval = time_interval
+        with Instrumentation.measure_stage("coincidence_matrix", nodes=list(file_paths), time_interval=time_interval,
+                                           workers=self._workers):
+            self._calculate_coincidence_matrix(file_paths=file_paths, time_interval=time_interval)
+
+    def _calculate_coincidence_matrix(self, file_paths, time_interval):
+        nodes = [self._load_node(file_path=file_path) for file_path in file_paths]
+        pairs = list(combinations(range(len(nodes)), 2))
+        if self._workers > 1 and len(pairs) > 1:
+            with ProcessPoolExecutor(max_workers=self._workers, initializer=CoincidenceCalculator._set_nodes_in_process,
+                                     initargs=(nodes,)) as executor:
+                summaries = list()
+                for summary, measurements in executor.map(CoincidenceCalculator._calculate_pair_in_process, pairs,
+                                                          [time_interval] * len(pairs),
+                                                          [Instrumentation.get_options()] * len(pairs)):
+                    Instrumentation.add_worker_measurements(measurements=measurements)
+                    summaries.append(summary)
+        else:
+            summaries = [self._calculate_node_pair_coincidences(node_a=nodes[node_a_idx], node_b=nodes[node_b_idx])
+                         for node_a_idx, node_b_idx in pairs]
+        self._create_coincidence_matrix_file(nodes=nodes, pairs=pairs, summaries=summaries,
+                                             filename=os.path.join(os.path.commonpath(file_paths) or ".",
+                                                                   "coincidence_matrix.csv"))
+
+    @staticmethod
+    def _set_nodes_in_process(nodes):
+        CoincidenceCalculator._nodes_in_process = nodes
+
+    @staticmethod
+    def _calculate_pair_in_process(pair, time_interval, options):
+        nodes = CoincidenceCalculator._nodes_in_process
+        calculator = CoincidenceCalculator()
+        calculator._time_interval = time_interval
+        return Instrumentation.run_in_worker(options=options, function=calculator._calculate_node_pair_coincidences,
+                                             node_a=nodes[pair[0]], node_b=nodes[pair[1]])
+
+    def _load_node(self, file_path):
+        self._get_file_names_from_path(file_path=file_path)
+        impulse_data = self._get_impulse_data()
+        return self._files[0].rsplit(sep="/", maxsplit=1)[0], impulse_data
+
+    def _calculate_node_pair_coincidences(self, node_a, node_b, write_file=True):
+        self._node_a_name, self._node_a_data = node_a
+        self._node_b_name, self._node_b_data = node_b
+        with Instrumentation.measure_file(filename=self._node_a_name + " - " + self._node_b_name):
+            self._get_starting_points()
+            self._calculate_coincidences()
+            if write_file:
+                self._create_coincidence_file()
+        return self._coincidence_summary
 
     def _get_file_names_from_path(self, file_path):
         self._files.clear()
@@ -37,107 +109,96 @@ class CoincidenceCalculator:
                 self._files.append(file_path + "/" + str(file))
 
     def _get_impulse_data(self):
+        if len(self._files) == 0:
+            raise CoincidenceCalculator.CoincidenceCalculatorError("no impulse files in directory")
+        return CoincidenceCalculator.get_node_impulse_data(impulse_logs=[self._get_single_impulse_file_data(file=file)
+                                                                         for file in self._files])
+
+    @staticmethod
+    def get_node_impulse_data(impulse_logs):
         inc_impulse_data = list()
         out_impulse_data = list()
-        if len(self._files) > 0:
-            for file in self._files:
-                impulse_data = self._get_single_impulse_file_data(file=file)
-                inc_impulse_data += impulse_data[0]
-                out_impulse_data += impulse_data[1]
-        else:
-            print("No files in directory. Exiting program.")
-            exit(1)
-        return inc_impulse_data, out_impulse_data
+        for inc_impulse_log, out_impulse_log in impulse_logs:
+            inc_impulse_data.append(inc_impulse_log)
+            out_impulse_data.append(out_impulse_log)
+        return (TrafficLog.concatenate(inc_impulse_data).sorted_by_date(),
+                TrafficLog.concatenate(out_impulse_data).sorted_by_date())
 
     def _get_single_impulse_file_data(self, file):
-        data = FileHandler.get_data_from_file(file)
-        incoming_data = True
-        inc_impulse_data = list()
-        out_impulse_data = list()
-        for line in data:
-            if "Incoming" in line:
-                incoming_data = True
-            elif "Outgoing" in line:
-                incoming_data = False
-            if "impulse" not in line:
-                if incoming_data:
-                    inc_impulse_data.append(line)
-                else:
-                    out_impulse_data.append(line)
-        inc_impulse_data.sort(key=lambda x: x.split(";")[0])
-        out_impulse_data.sort(key=lambda x: x.split(";")[0])
+        try:
+            inc_impulse_data, out_impulse_data = ImpulseFileParser.parse_file(filename=file, use_mmap=self._use_mmap,
+                                                                              cache=self._cache)
+        except TrafficLog.TrafficLogError as e:
+            raise CoincidenceCalculator.CoincidenceCalculatorError("file: {} could not be parsed: {}".format(file, e))
         return inc_impulse_data, out_impulse_data
 
     def _get_starting_points(self):
-        self._node_a_inc_start_date = int(self._node_a_data[0][0].split(";")[0])
-        self._node_a_out_start_date = int(self._node_a_data[1][0].split(";")[0])
-        self._node_b_inc_start_date = int(self._node_b_data[0][0].split(";")[0])
-        self._node_b_out_start_date = int(self._node_b_data[1][0].split(";")[0])
+        self._node_a_inc_start_date = self._get_start_date(impulse_data=self._node_a_data[0])
+        self._node_a_out_start_date = self._get_start_date(impulse_data=self._node_a_data[1])
+        self._node_b_inc_start_date = self._get_start_date(impulse_data=self._node_b_data[0])
+        self._node_b_out_start_date = self._get_start_date(impulse_data=self._node_b_data[1])
+
+    @staticmethod
+    def _get_start_date(impulse_data):
+        if len(impulse_data.timestamps) == 0:
+            return 0
+        return impulse_data.timestamps[0]
 
     def _calculate_coincidences(self):
-        if self._node_a_inc_start_date >= self._node_b_inc_start_date:
-            node_a = self._node_a_data[0]
-            node_b = self._node_b_data[0]
-        else:
-            node_a = self._node_b_data[0]
-            node_b = self._node_a_data[0]
-        inc_coincidence_data = list()
-        new_impulse = True
-        number_of_impulses = 0
-        last_idx = 0
-        for impulse_a in node_a:
-            impulse_a_date = int(impulse_a.split(";")[0])
-            for idx, impulse_b in enumerate(node_b[last_idx:], start=last_idx):
-                impulse_b_date = int(impulse_b.split(";")[0])
-                predicted_date = impulse_b_date + self._time_interval
-                if impulse_b_date <= impulse_a_date <= predicted_date:
-                    if new_impulse:
-                        inc_coincidence_data.append("impulse starts")
-                        number_of_impulses += 1
-                        new_impulse = False
-                    inc_coincidence_data.append(impulse_a)
-                    last_idx = idx + 1
-                    break
-            else:
-                new_impulse = True
-        inc_coincidence_data.append("Number of incoming impulses;{}".format(number_of_impulses))
-        total_impulse_time = 0
-        for line in inc_coincidence_data:
-            if "impulse" not in line:
-                total_impulse_time += self._time_interval
-        inc_coincidence_data.append("Average incoming impulse time;{}".format(total_impulse_time/number_of_impulses))
-        if self._node_a_out_start_date >= self._node_b_out_start_date:
-            node_a = self._node_a_data[1]
-            node_b = self._node_b_data[1]
+        inc_coincidence_data, inc_summary = self._calculate_direction_coincidences(
+            node_a_data=self._node_a_data[0], node_b_data=self._node_b_data[0],
+            node_a_start_date=self._node_a_inc_start_date, node_b_start_date=self._node_b_inc_start_date,
+            direction="incoming")
+        out_coincidence_data, out_summary = self._calculate_direction_coincidences(
+            node_a_data=self._node_a_data[1], node_b_data=self._node_b_data[1],
+            node_a_start_date=self._node_a_out_start_date, node_b_start_date=self._node_b_out_start_date,
+            direction="outgoing")
+        self._coincidence_data = inc_coincidence_data, out_coincidence_data
+        self._coincidence_summary = inc_summary + out_summary
+
+    def _calculate_direction_coincidences(self, node_a_data, node_b_data, node_a_start_date, node_b_start_date,
+                                          direction):
+        if node_a_start_date >= node_b_start_date:
+            node_a = node_a_data
+            node_b = node_b_data
         else:
-            node_a = self._node_b_data[1]
-            node_b = self._node_a_data[1]
-        out_coincidence_data = list()
+            node_a = node_b_data
+            node_b = node_a_data
+        matches, impulse_starts = self._match_impulses(dates_a=node_a.timestamps, dates_b=node_b.timestamps,
+                                                       time_interval=self._time_interval)
+        coincidence_data = list()
+        for idx, is_impulse_start in zip(matches, impulse_starts):
+            if is_impulse_start:
+                coincidence_data.append("impulse starts")
+            coincidence_data.append(self._format_impulse(date=node_a.timestamps[idx], value=node_a.columns[0][idx]))
+        number_of_impulses = sum(impulse_starts)
+        average_impulse_time = len(matches) * self._time_interval / max(number_of_impulses, 1)
+        coincidence_data.append("Number of {} impulses;{}".format(direction, number_of_impulses))
+        coincidence_data.append("Average {} impulse time;{}".format(direction, average_impulse_time))
+        return coincidence_data, (number_of_impulses, average_impulse_time)
+
+    @staticmethod
+    def _match_impulses(dates_a, dates_b, time_interval):
+        matches = array("q")
+        impulse_starts = list()
         new_impulse = True
-        number_of_impulses = 0
-        last_idx = 0
-        for impulse_a in node_a:
-            impulse_a_date = int(impulse_a.split(";")[0])
-            for idx, impulse_b in enumerate(node_b[last_idx:], start=last_idx):
-                impulse_b_date = int(impulse_b.split(";")[0])
-                predicted_date = impulse_b_date + self._time_interval
-                if impulse_b_date <= impulse_a_date <= predicted_date:
-                    if new_impulse:
-                        out_coincidence_data.append("impulse starts")
-                        number_of_impulses += 1
-                        new_impulse = False
-                    out_coincidence_data.append(impulse_a)
-                    last_idx = idx + 1
-                    break
+        idx_b = 0
+        number_of_dates_b = len(dates_b)
+        for idx_a, date_a in enumerate(dates_a):
+            while idx_b < number_of_dates_b and dates_b[idx_b] < date_a - time_interval:
+                idx_b += 1
+            if idx_b < number_of_dates_b and dates_b[idx_b] <= date_a:
+                matches.append(idx_a)
+                impulse_starts.append(new_impulse)
+                new_impulse = False
+                idx_b += 1
             else:
                 new_impulse = True
-        out_coincidence_data.append("Number of outgoing impulses;{}".format(number_of_impulses))
-        total_impulse_time = 0
-        for line in out_coincidence_data:
-            if "impulse" not in line:
-                total_impulse_time += self._time_interval
-        out_coincidence_data.append("Average outgoing impulse time;{}".format(total_impulse_time/number_of_impulses))
-        self._coincidence_data = inc_coincidence_data, out_coincidence_data
+        return matches, impulse_starts
+
+    @staticmethod
+    def _format_impulse(date, value):
+        return "{};{}".format(date, DataHandler.format_value(value=value))
 
     def _create_coincidence_file(self):
         data = [["Incoming impulses coincidences"]]
@@ -146,6 +207,26 @@ class CoincidenceCalculator:
         data.append(["Outgoing impulses coincidences"])
         for item in self._coincidence_data[1]:
             data.append([item])
-        file_name = self._node_b_name.rsplit("/")[-2]
+        file_name = self._get_node_label(node_name=self._node_b_name)
         file_name = self._node_a_name + "/coincidence_with_node_" + file_name + ".csv"
         FileWriter.write_data_to_file(data=data, filename=file_name)
+
+    @staticmethod
+    def _get_node_label(node_name):
+        return node_name.rsplit("/")[-2]
+
+    @staticmethod
+    def _create_coincidence_matrix_file(nodes, pairs, summaries, filename):
+        labels = [CoincidenceCalculator._get_node_label(node_name=node_name) for node_name, _ in nodes]
+        titles = ("Number of incoming impulses", "Average incoming impulse time", "Number of outgoing impulses",
+                  "Average outgoing impulse time")
+        data = list()
+        for summary_idx, title in enumerate(titles):
+            matrix = [[""] * len(nodes) for _ in nodes]
+            for (node_a_idx, node_b_idx), summary in zip(pairs, summaries):
+                matrix[node_a_idx][node_b_idx] = summary[summary_idx]
+                matrix[node_b_idx][node_a_idx] = summary[summary_idx]
+            data.append([title] + labels)
+            for label, row in zip(labels, matrix):
+                data.append([label] + row)
+        FileWriter.write_data_to_file(data=data, filename=filename)
@@ -32,3 +32,9 @@ class DataHandler:
             return value
         else:
             return converted_value
+
+    @staticmethod
+    def format_value(value):
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
@@ -1,24 +1,556 @@
+import bz2
 import errno
+import gzip
+import io
+import lzma
+import mmap
 import os
+import time
+from array import array
+
+from app.binary_log import BinaryLog
+from app.instrumentation import Instrumentation
 
 
 class FileHandler:
 
+    compression_level = 6
+    compression_buffer_size = 1024 * 1024
+    _COMPRESSIONS = (".gz", ".bz2", ".xz")
+    _MAGIC_BYTES = ((b"\x1f\x8b", ".gz"), (b"BZh", ".bz2"), (b"\xfd7zXZ\x00", ".xz"))
+
+    @staticmethod
+    def get_compression(filename):
+        for compression in FileHandler._COMPRESSIONS:
+            if filename.endswith(compression):
+                return compression
+        return None
+
+    @staticmethod
+    def strip_compression(filename):
+        compression = FileHandler.get_compression(filename=filename)
+        if compression is None:
+            return filename
+        return filename[:-len(compression)]
+
+    @staticmethod
+    def detect_compression(filename):
+        compression = FileHandler.get_compression(filename=filename)
+        if compression is not None:
+            return compression
+        with open(filename, "rb") as file:
+            start = file.read(6)
+        for magic_bytes, compression in FileHandler._MAGIC_BYTES:
+            if start.startswith(magic_bytes):
+                return compression
+        return None
+
+    @staticmethod
+    def open_file_for_reading(filename, binary=False):
+        compression = FileHandler.detect_compression(filename=filename)
+        if compression is None:
+            return open(filename, "rb" if binary else "r")
+        if compression == ".gz":
+            file = gzip.open(filename, "rb")
+        elif compression == ".bz2":
+            file = bz2.open(filename, "rb")
+        else:
+            file = lzma.open(filename, "rb")
+        file = io.BufferedReader(file, buffer_size=FileHandler.compression_buffer_size)
+        return file if binary else io.TextIOWrapper(file)
+
+    @staticmethod
+    def get_data_from_file(filename, use_mmap=False):
+        if BinaryLog.is_binary_log(filename=filename):
+            data = list(BinaryLog.read(filename=filename, use_mmap=use_mmap).iterate_lines())
+        elif use_mmap and FileHandler.detect_compression(filename=filename) is None:
+            data = MappedLines(filename=filename)
+        else:
+            with FileHandler.open_file_for_reading(filename=filename) as file:
+                data = file.read().splitlines()
+        if Instrumentation.enabled:
+            Instrumentation.add_file_read(filename=filename, rows_read=len(data))
+        return data
+
+    @staticmethod
+    def iterate_data_from_file(filename, use_mmap=False):
+        if BinaryLog.is_binary_log(filename=filename):
+            lines = BinaryLog.read(filename=filename, use_mmap=use_mmap).iterate_lines()
+        elif use_mmap and FileHandler.detect_compression(filename=filename) is None:
+            lines = FileHandler._iterate_mapped_lines(filename=filename)
+        else:
+            lines = FileHandler._iterate_lines(file=FileHandler.open_file_for_reading(filename=filename))
+        Instrumentation.add_file_read(filename=filename)
+        return Instrumentation.count_rows_read(lines=lines)
+
+    @staticmethod
+    def _iterate_lines(file):
+        with file:
+            for line in file:
+                yield line.rstrip("\n")
+
+    @staticmethod
+    def _iterate_mapped_lines(filename):
+        with MappedLines(filename=filename) as lines:
+            yield from lines
+
+    @staticmethod
+    def iterate_data_from_offset(filename, offset):
+        file = FileHandler.open_file_for_reading(filename=filename, binary=True)
+        file.seek(offset)
+        return FileHandler._iterate_binary_lines(file=file)
+
     @staticmethod
-    def get_data_from_file(filename):
-        with open(filename, "r") as file:
-            data = file.read().splitlines()
-            return data
+    def _iterate_binary_lines(file):
+        with file:
+            for line in file:
+                yield line.rstrip(b"\r\n").decode()
+
+    @staticmethod
+    def iterate_data_with_offsets(filename):
+        file = FileHandler.open_file_for_reading(filename=filename, binary=True)
+        return FileHandler._iterate_binary_lines_with_offsets(file=file)
+
+    @staticmethod
+    def _iterate_binary_lines_with_offsets(file):
+        with file:
+            offset = 0
+            for line in file:
+                yield offset, line.rstrip(b"\r\n").decode()
+                offset += len(line)
 
     @staticmethod
     def write_data_to_file(data, filename):
+        with FileWriter(filename=filename) as writer:
+            writer.write_entries(entries=data)
+
+    @staticmethod
+    def write_binary_log_to_file(binary_log, filename):
+        with FileWriter(filename=filename) as writer:
+            binary_log.write_to(writer=writer)
+
+    @staticmethod
+    def open_file_for_writing(filename, buffer_size=-1, compression=None):
         if not os.path.exists(os.path.dirname(filename)):
             try:
                 os.makedirs(os.path.dirname(filename))
             except OSError as exc:
                 if exc.errno != errno.EEXIST:
                     raise
-        with open(filename, 'w') as file:
-            for line in data:
-                file.write(line)
-                file.write("\n")
+        if compression is None:
+            compression = FileHandler.get_compression(filename=filename)
+        if compression is None:
+            return open(filename, 'w', buffering=buffer_size)
+        if compression == ".gz":
+            file = gzip.open(filename, "wb", compresslevel=FileHandler.compression_level)
+        elif compression == ".bz2":
+            file = bz2.open(filename, "wb", compresslevel=max(FileHandler.compression_level, 1))
+        elif compression == ".xz":
+            file = lzma.open(filename, "wb", preset=FileHandler.compression_level)
+        else:
+            raise ValueError("unsupported compression: {}".format(compression))
+        file = io.BufferedWriter(file, buffer_size=buffer_size if buffer_size > 1
+                                 else FileHandler.compression_buffer_size)
+        return io.TextIOWrapper(file, line_buffering=buffer_size == 1)
+
+    @staticmethod
+    def wrap_compressed_writer(file, compression, name=""):
+        if compression == ".gz":
+            return gzip.GzipFile(filename=name, mode="wb", compresslevel=FileHandler.compression_level, fileobj=file)
+        if compression == ".bz2":
+            return bz2.BZ2File(file, "wb", compresslevel=max(FileHandler.compression_level, 1))
+        if compression == ".xz":
+            return lzma.LZMAFile(file, "wb", preset=FileHandler.compression_level)
+        raise ValueError("unsupported compression: {}".format(compression))
+
+
+class LineReader:
+
+    def __init__(self, filename, offset=0):
+        self._file = FileHandler.open_file_for_reading(filename=filename, binary=True)
+        self._file.seek(offset)
+        self._offset = offset
+        self._line_offset = offset
+
+    @property
+    def offset(self):
+        return self._offset
+
+    @property
+    def line_offset(self):
+        return self._line_offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def __iter__(self):
+        for line in self._file:
+            self._line_offset = self._offset
+            self._offset += len(line)
+            yield line.rstrip(b"\r\n").decode()
+
+
+class FileFollower:
+
+    def __init__(self, filename, offset=0, poll_interval_sec=1.0, max_idle_sec=None):
+        self._filename = filename
+        self._file = open(filename, "rb")
+        self._file.seek(offset)
+        self._offset = offset
+        self._line_offset = offset
+        self._poll_interval_sec = poll_interval_sec
+        self._max_idle_sec = max_idle_sec
+
+    @property
+    def offset(self):
+        return self._offset
+
+    @property
+    def line_offset(self):
+        return self._line_offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def __iter__(self):
+        partial_line = bytes()
+        idle_sec = 0.0
+        while True:
+            line = self._file.readline()
+            if line:
+                idle_sec = 0.0
+                partial_line += line
+                if partial_line.endswith(b"\n"):
+                    yield self._read_line(line=partial_line)
+                    partial_line = bytes()
+                continue
+            if self._is_rotated(position=self._offset + len(partial_line)):
+                if partial_line:
+                    yield self._read_line(line=partial_line)
+                    partial_line = bytes()
+                self._reopen()
+                continue
+            if self._max_idle_sec is not None and idle_sec >= self._max_idle_sec:
+                return
+            time.sleep(self._poll_interval_sec)
+            idle_sec += self._poll_interval_sec
+
+    def _read_line(self, line):
+        self._line_offset = self._offset
+        self._offset += len(line)
+        return line.rstrip(b"\r\n").decode()
+
+    def _is_rotated(self, position):
+        try:
+            stat = os.stat(self._filename)
+        except FileNotFoundError:
+            return False
+        return stat.st_ino != os.fstat(self._file.fileno()).st_ino or stat.st_size < position
+
+    def _reopen(self):
+        self._file.close()
+        self._file = open(self._filename, "rb")
+        self._offset = 0
+        self._line_offset = 0
+
+
+class MappedLines:
+
+    def __init__(self, filename):
+        self._file = open(filename, "rb")
+        try:
+            if os.fstat(self._file.fileno()).st_size > 0:
+                self._mapping = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._mapping = bytes()
+        except BaseException:
+            self._file.close()
+            raise
+        self._offsets = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if isinstance(self._mapping, mmap.mmap):
+            self._mapping.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._get_offsets()) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                return [self[line_idx] for line_idx in range(start, stop, step)]
+            return MappedLinesView(lines=self, start=start, stop=stop)
+        offsets = self._get_offsets()
+        if idx < 0:
+            idx += len(offsets) - 1
+        if not 0 <= idx < len(offsets) - 1:
+            raise IndexError("line index out of range")
+        return self._decode_line(start=offsets[idx], end=offsets[idx + 1])
+
+    def __iter__(self):
+        position = 0
+        size = len(self._mapping)
+        while position < size:
+            end = self._mapping.find(b"\n", position)
+            end = size if end == -1 else end + 1
+            yield self._decode_line(start=position, end=end)
+            position = end
+
+    def get_fields(self, idx):
+        return self[idx].split(";")
+
+    def _decode_line(self, start, end):
+        line = self._mapping[start:end]
+        if line.endswith(b"\n"):
+            line = line[:-1]
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        return line.decode()
+
+    def _get_offsets(self):
+        if self._offsets is None:
+            offsets = array("q", [0])
+            size = len(self._mapping)
+            end = self._mapping.find(b"\n")
+            while end != -1:
+                offsets.append(end + 1)
+                end = self._mapping.find(b"\n", end + 1)
+            if offsets[-1] != size:
+                offsets.append(size)
+            self._offsets = offsets
+        return self._offsets
+
+
+class MappedLinesView:
+
+    def __init__(self, lines, start, stop):
+        self._lines = lines
+        self._start = start
+        self._stop = max(start, stop)
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                return [self[line_idx] for line_idx in range(start, stop, step)]
+            return MappedLinesView(lines=self._lines, start=self._start + start, stop=self._start + stop)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("line index out of range")
+        return self._lines[self._start + idx]
+
+    def __iter__(self):
+        for idx in range(self._start, self._stop):
+            yield self._lines[idx]
+
+
+class FileWriterStatistics:
+
+    def __init__(self):
+        self._files_written = 0
+        self._lines_written = 0
+        self._bytes_written = 0
+        self._write_time_sec = 0.0
+
+    @property
+    def files_written(self):
+        return self._files_written
+
+    @property
+    def lines_written(self):
+        return self._lines_written
+
+    @property
+    def bytes_written(self):
+        return self._bytes_written
+
+    @property
+    def write_time_sec(self):
+        return self._write_time_sec
+
+    @property
+    def throughput(self):
+        if self._write_time_sec == 0:
+            return 0.0
+        return self._bytes_written / self._write_time_sec
+
+    def add(self, lines_written, bytes_written, write_time_sec, files_written=0):
+        self._files_written += files_written
+        self._lines_written += lines_written
+        self._bytes_written += bytes_written
+        self._write_time_sec += write_time_sec
+
+    def reset(self):
+        self._files_written = 0
+        self._lines_written = 0
+        self._bytes_written = 0
+        self._write_time_sec = 0.0
+
+
+class FileWriter:
+
+    TEMPORARY_EXTENSION = ".part"
+    buffer_size = 1024 * 1024
+    batch_size = 4096
+    fsync = True
+    statistics = FileWriterStatistics()
+
+    def __init__(self, filename, buffer_size=-1, compression=None):
+        self._filename = filename
+        self._temporary_filename = filename + FileWriter.TEMPORARY_EXTENSION
+        if compression is None:
+            compression = FileHandler.get_compression(filename=filename)
+        if os.path.dirname(filename) and not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self._raw_file = open(self._temporary_filename, "wb",
+                              buffering=buffer_size if buffer_size > 1 else FileWriter.buffer_size)
+        self._file = self._raw_file
+        if compression is not None:
+            try:
+                self._file = FileHandler.wrap_compressed_writer(file=self._raw_file, compression=compression,
+                                                                name=os.path.basename(FileHandler.strip_compression(
+                                                                    filename=filename)))
+            except ValueError:
+                self.discard()
+                raise
+        self._batch = list()
+        self._lines_written = 0
+        self._bytes_written = 0
+        self._write_time_sec = 0.0
+        self._closed = False
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def lines_written(self):
+        return self._lines_written
+
+    @property
+    def bytes_written(self):
+        return self._bytes_written
+
+    @property
+    def write_time_sec(self):
+        return self._write_time_sec
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+    def write(self, entry):
+        self._batch.append(FileWriter.format_entry(entry=entry))
+        if len(self._batch) >= FileWriter.batch_size:
+            self._write_batch()
+
+    def write_entries(self, entries):
+        batch = self._batch
+        for entry in entries:
+            batch.append(entry if isinstance(entry, str) else ";".join(map(str, entry)))
+            if len(batch) >= FileWriter.batch_size:
+                self._write_batch()
+                batch = self._batch
+
+    def write_bytes(self, data, lines_written=0):
+        self._write_batch()
+        start_time = time.perf_counter()
+        self._file.write(data)
+        self._add_statistics(lines_written=lines_written, bytes_written=memoryview(data).nbytes,
+                             write_time_sec=time.perf_counter() - start_time)
+
+    def iterate_entries(self, entries):
+        for entry in entries:
+            self.write(entry=entry)
+            yield entry
+
+    def _write_batch(self):
+        if len(self._batch) == 0:
+            return
+        start_time = time.perf_counter()
+        self._batch.append("")
+        data = "\n".join(self._batch).encode()
+        self._file.write(data)
+        write_time_sec = time.perf_counter() - start_time
+        self._add_statistics(lines_written=len(self._batch) - 1, bytes_written=len(data),
+                             write_time_sec=write_time_sec)
+        self._batch = list()
+
+    def _add_statistics(self, lines_written, bytes_written, write_time_sec, files_written=0):
+        self._lines_written += lines_written
+        self._bytes_written += bytes_written
+        self._write_time_sec += write_time_sec
+        FileWriter.statistics.add(lines_written=lines_written, bytes_written=bytes_written,
+                                  write_time_sec=write_time_sec, files_written=files_written)
+
+    def commit(self):
+        if self._closed:
+            return
+        try:
+            self._write_batch()
+            start_time = time.perf_counter()
+            if self._file is not self._raw_file:
+                self._file.close()
+            self._raw_file.flush()
+            if FileWriter.fsync:
+                os.fsync(self._raw_file.fileno())
+            self._raw_file.close()
+            self._closed = True
+            os.replace(self._temporary_filename, self._filename)
+        except BaseException:
+            self.discard()
+            raise
+        self._add_statistics(lines_written=0, bytes_written=0, write_time_sec=time.perf_counter() - start_time,
+                             files_written=1)
+        Instrumentation.add_io(rows_written=self._lines_written, bytes_written=self._bytes_written)
+
+    def discard(self):
+        if not self._raw_file.closed:
+            try:
+                if self._file is not self._raw_file:
+                    self._file.close()
+            finally:
+                self._raw_file.close()
+        self._closed = True
+        self._batch = list()
+        if os.path.exists(self._temporary_filename):
+            os.remove(self._temporary_filename)
+
+    @staticmethod
+    def format_entry(entry):
+        if isinstance(entry, str):
+            return entry
+        return ";".join(map(str, entry))
+
+    @staticmethod
+    def write_data_to_file(data, filename):
+        FileHandler.write_data_to_file(data=data, filename=filename)
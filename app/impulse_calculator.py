@@ -1,116 +1,137 @@
+import itertools
+import operator
 import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
-from app.data_handler import DataHandler
-from app.file_handler import FileHandler
+from app.file_handler import FileHandler, FileWriter
+from app.instrumentation import Instrumentation
+from app.parsed_data_cache import ParsedDataCache
+from app.traffic_log import TrafficLog, TrafficLogParser
 
 
 class ImpulseCalculator:
 
-    def __init__(self):
+    class ImpulseCalculatorError(Exception):
+        pass
+
+    def __init__(self, use_mmap=False, workers=1, cache=None):
+        self._use_mmap = use_mmap
+        self._cache = cache
+        self._workers = workers if workers is not None else os.cpu_count()
         self._files = list()
         self._time_interval = 0
         self._impulse_data = None
 
     def calculate_impulses_in_directory(self, file_path):
-        self._get_file_names_from_path(file_path=file_path)
-        self._calculate_impulses_for_files()
+        with Instrumentation.measure_stage("impulses", directory=file_path, workers=self._workers):
+            self._get_file_names_from_path(file_path=file_path)
+            self._calculate_impulses_for_files()
 
     def parse_impulse_data_in_directory(self, file_path):
-        self._get_file_names_from_path(file_path=file_path, find_impulses=True)
-        self._parse_impulse_data_for_files()
+        with Instrumentation.measure_stage("impulse_summary", directory=file_path, workers=self._workers):
+            self._get_file_names_from_path(file_path=file_path, find_impulses=True)
+            self._parse_impulse_data_for_files()
 
     def _get_file_names_from_path(self, file_path, find_impulses=False):
         self._files.clear()
         if not find_impulses:
             for file in os.listdir(file_path):
-                if not file.endswith("impulse.csv") and not file.endswith("impulses.csv"):
+                if not file.endswith("impulse.csv") and not file.endswith("impulses.csv") \
+                        and not file.endswith(ParsedDataCache.EXTENSION) \
+                        and not file.endswith(FileWriter.TEMPORARY_EXTENSION) \
+                        and not file.startswith("coincidence_with_node_"):
                     self._files.append(file_path + "/" + str(file))
         else:
             for file in os.listdir(file_path):
                 if file.endswith("impulse.csv") and not file.endswith("total_impulses.csv"):
                     self._files.append(file_path + "/" + str(file))
-            self._files.sort(key=lambda x: int(x.rsplit(sep="_", maxsplit=2)[-2]))
+            self._files.sort(key=lambda x: ImpulseCalculator._get_file_number(file=x))
 
     def _calculate_impulses_for_files(self):
         if len(self._files) > 0:
-            for file in self._files:
-                self._calculate_impulses(file=file)
+            if self._workers > 1 and len(self._files) > 1:
+                with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                    for _, measurements in executor.map(ImpulseCalculator._calculate_impulses_in_process, self._files,
+                                                        [self._use_mmap] * len(self._files),
+                                                        [self._cache] * len(self._files),
+                                                        [Instrumentation.get_options()] * len(self._files)):
+                        Instrumentation.add_worker_measurements(measurements=measurements)
+            else:
+                for file in self._files:
+                    self._calculate_impulses(file=file)
         else:
-            print("No files in directory. Exiting program.")
-            exit(1)
+            raise ImpulseCalculator.ImpulseCalculatorError("no log files in directory")
+
+    @staticmethod
+    def _calculate_impulses_in_process(file, use_mmap, cache, options):
+        calculator = ImpulseCalculator(use_mmap=use_mmap, cache=cache)
+        return Instrumentation.run_in_worker(options=options, function=calculator._calculate_impulses, file=file)
 
     def _calculate_impulses(self, file):
-        data = FileHandler.get_data_from_file(file)
-        data = [line.split(";") for line in data]
-        data = [[DataHandler.convert_to_float(value=item) for item in line] for line in data]
-        data = [[DataHandler.convert_to_int(value=item) for item in line] for line in data]
-        self._time_interval = data[1][0] - data[0][0]
-        if "Average" not in data[-3][0]:
-            print("No average values present to calculate from. Exiting program.")
-            exit(1)
-        incoming_impulse_threshold = data[-4][1]
-        outgoing_impulse_threshold = data[-4][2]
-        impulses = self._get_impulses(data=data, inc_impulse=incoming_impulse_threshold,
-                                      out_impulse=outgoing_impulse_threshold)
-        number_of_impulses = self._calculate_number_of_impulses(impulses=impulses)
-        average_impulse_time = self._calculate_average_impulse_time(impulses=impulses,
-                                                                    number_of_impulses=number_of_impulses)
-        self._add_impulse_data(impulses=impulses, number=number_of_impulses, avg_time=average_impulse_time)
-        self._create_impulse_data_file(filename=str(file))
-
-    def _get_impulses(self, data, inc_impulse, out_impulse):
-        incoming_impulses = list()
-        outgoing_impulses = list()
-        new_inc_impulse = True
-        new_out_impulse = True
-        for line in data:
-            if isinstance(line[0], str):
-                continue
-            if line[1] > inc_impulse:
-                if new_inc_impulse:
-                    incoming_impulses.append(["impulse start"])
-                    new_inc_impulse = False
-                impulse = [line[0], line[1]]
-                incoming_impulses.append(impulse)
-            else:
-                new_inc_impulse = True
-            if line[2] > out_impulse:
-                if new_out_impulse:
-                    outgoing_impulses.append(["impulse start"])
-                    new_out_impulse = False
-                impulse = [line[0], line[2]]
-                outgoing_impulses.append(impulse)
-            else:
-                new_out_impulse = True
-        return incoming_impulses, outgoing_impulses
-
-    def _calculate_number_of_impulses(self, impulses):
-        incoming_impulses = impulses[0]
-        outgoing_impulses = impulses[1]
-        number_of_incoming_impulses = 0
-        number_of_outgoing_impulses = 0
-        for item in incoming_impulses:
-            if isinstance(item[0], str) and "start" in item[0]:
-                number_of_incoming_impulses += 1
-        for item in outgoing_impulses:
-            if isinstance(item[0], str) and "start" in item[0]:
-                number_of_outgoing_impulses += 1
-        return number_of_incoming_impulses, number_of_outgoing_impulses
-
-    def _calculate_average_impulse_time(self, impulses, number_of_impulses):
-        inc_impulses = 1 if number_of_impulses[0] == 0 else number_of_impulses[0]
-        out_impulses = 1 if number_of_impulses[1] == 0 else number_of_impulses[1]
-        total_time = 0
-        for item in impulses[0]:
-            if "start" not in item:
-                total_time += self._time_interval
-        average_incoming_impulse_time = total_time / inc_impulses
-        total_time = 0
-        for item in impulses[1]:
-            if "start" not in item:
-                total_time += self._time_interval
-        average_outgoing_impulse_time = total_time / out_impulses
-        return average_incoming_impulse_time, average_outgoing_impulse_time
+        with Instrumentation.measure_file(filename=file):
+            try:
+                data = self._parse_log_file(file=file)
+            except TrafficLog.TrafficLogError as e:
+                raise ImpulseCalculator.ImpulseCalculatorError("file: {} could not be parsed: {}".format(file, e))
+            self.calculate_impulses_for_log(traffic_log=data, filename=file)
+
+    def calculate_impulses_for_log(self, traffic_log, filename=None):
+        data = traffic_log.as_integers()
+        self._time_interval = data.timestamps[1] - data.timestamps[0]
+        if len(data.summary) < 4 or "Average" not in str(data.summary[-3][0]):
+            raise ImpulseCalculator.ImpulseCalculatorError("no average values present to calculate from in log: {}"
+                                                           .format(filename))
+        incoming_impulse_threshold = data.summary[-4][1]
+        outgoing_impulse_threshold = data.summary[-4][2]
+        incoming_impulses = ImpulseRuns.detect(values=data.columns[0], threshold=incoming_impulse_threshold)
+        outgoing_impulses = ImpulseRuns.detect(values=data.columns[1], threshold=outgoing_impulse_threshold)
+        impulses = (incoming_impulses.get_impulse_entries(timestamps=data.timestamps, values=data.columns[0]),
+                    outgoing_impulses.get_impulse_entries(timestamps=data.timestamps, values=data.columns[1]))
+        number_of_impulses = incoming_impulses.number_of_impulses, outgoing_impulses.number_of_impulses
+        average_impulse_time = (incoming_impulses.get_average_impulse_time(time_interval=self._time_interval),
+                                outgoing_impulses.get_average_impulse_time(time_interval=self._time_interval))
+        if filename is not None:
+            self._add_impulse_data(impulses=impulses, number=number_of_impulses, avg_time=average_impulse_time)
+            self._create_impulse_data_file(filename=str(filename))
+        return (incoming_impulses.get_impulse_log(timestamps=data.timestamps, values=data.columns[0], summary=[
+                    ["Number of incoming impulses", number_of_impulses[0]],
+                    ["Average incoming impulse time", average_impulse_time[0]]]),
+                outgoing_impulses.get_impulse_log(timestamps=data.timestamps, values=data.columns[1], summary=[
+                    ["Number of outgoing impulses", number_of_impulses[1]],
+                    ["Average outgoing impulse time", average_impulse_time[1]]]))
+
+    def create_total_impulse_file(self, file_path, impulse_logs):
+        impulse_data = list()
+        impulse_logs = [(ImpulseCalculator.get_impulse_file_name(filename=filename), logs)
+                        for filename, logs in impulse_logs]
+        for file, logs in sorted(impulse_logs, key=lambda item: ImpulseCalculator._get_file_number(file=item[0])):
+            impulse_data.append(ImpulseCalculator._get_file_label(file=file))
+            for log in logs:
+                impulse_data += [FileWriter.format_entry(entry=entry) for entry in log.summary]
+        self._impulse_data = [line.split(";") for line in impulse_data]
+        self._create_impulse_data_file(filename=file_path, total_impulse=True)
+
+    @staticmethod
+    def get_impulse_file_name(filename):
+        return FileHandler.strip_compression(filename=filename)[:-4] + "_impulse.csv"
+
+    @staticmethod
+    def _get_file_number(file):
+        return int(file.rsplit(sep="_", maxsplit=2)[-2])
+
+    @staticmethod
+    def _get_file_label(file):
+        name = file.rsplit(sep="/", maxsplit=1)[1].split(sep="_")[1:3]
+        return name[0] + " " + name[1]
+
+    def _parse_log_file(self, file):
+        if self._cache is not None:
+            return self._cache.get_traffic_logs(filename=file, parse=self._parse_log_file_without_cache)[0]
+        return self._parse_log_file_without_cache(file=file)[0]
+
+    def _parse_log_file_without_cache(self, file):
+        return (TrafficLogParser.parse_file(filename=file, use_mmap=self._use_mmap),)
 
     def _add_impulse_data(self, impulses, number, avg_time):
         inc_number = ["Number of incoming impulses", number[0]]
@@ -127,7 +148,7 @@ class ImpulseCalculator:
         if total_impulse:
             file = filename + "/total_impulses.csv"
         else:
-            file = filename[:-4] + "_impulse.csv"
+            file = ImpulseCalculator.get_impulse_file_name(filename=filename)
         data = [line for line in self._impulse_data]
         self._impulse_data = list()
         FileWriter.write_data_to_file(data=data, filename=file)
@@ -135,21 +156,132 @@ class ImpulseCalculator:
     def _parse_impulse_data_for_files(self):
         impulse_data = list()
         if len(self._files) > 0:
-            for file in self._files:
-                impulse_data += self._parse_impulses(file=file)
+            if self._workers > 1 and len(self._files) > 1:
+                with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                    for file_impulse_data, measurements in executor.map(
+                            ImpulseCalculator._parse_impulses_in_process, self._files,
+                            [self._use_mmap] * len(self._files), [self._cache] * len(self._files),
+                            [Instrumentation.get_options()] * len(self._files)):
+                        Instrumentation.add_worker_measurements(measurements=measurements)
+                        impulse_data += file_impulse_data
+            else:
+                for file in self._files:
+                    impulse_data += self._parse_impulses(file=file)
             self._impulse_data = [line.split(";") for line in impulse_data]
             file_name = self._files[0].rsplit(sep="/", maxsplit=1)[0]
             self._create_impulse_data_file(filename=file_name, total_impulse=True)
         else:
-            print("No files in directory. Exiting program.")
-            exit(1)
+            raise ImpulseCalculator.ImpulseCalculatorError("no impulse files in directory")
+
+    @staticmethod
+    def _parse_impulses_in_process(file, use_mmap, cache, options):
+        calculator = ImpulseCalculator(use_mmap=use_mmap, cache=cache)
+        return Instrumentation.run_in_worker(options=options, function=calculator._parse_impulses, file=file)
 
     def _parse_impulses(self, file):
-        data = FileHandler.get_data_from_file(file)
-        name = file.rsplit(sep="/", maxsplit=1)[1].split(sep="_")[1:3]
-        name = name[0] + " " + name[1]
-        impulse_data = [name]
+        with Instrumentation.measure_file(filename=file):
+            return self._parse_impulse_summary(file=file)
+
+    def _parse_impulse_summary(self, file):
+        impulse_data = [ImpulseCalculator._get_file_label(file=file)]
+        if self._cache is not None:
+            impulse_logs = ImpulseFileParser.parse_file(filename=file, use_mmap=self._use_mmap, cache=self._cache)
+            for impulse_log in impulse_logs:
+                lines = [FileWriter.format_entry(entry=entry) for entry in impulse_log.summary]
+                impulse_data += [line for line in lines if ImpulseFileParser._is_summary_line(line=line)]
+            return impulse_data
+        data = FileHandler.iterate_data_from_file(file, use_mmap=self._use_mmap)
         for line in data:
-            if "Number of inc" in line or "Average inc" in line or "Number of outg" in line or "Average out" in line:
+            if ImpulseFileParser._is_summary_line(line=line):
                 impulse_data.append(line)
         return impulse_data
+
+
+class ImpulseRuns:
+
+    def __init__(self, starts, lengths):
+        self._starts = starts
+        self._lengths = lengths
+
+    @property
+    def starts(self):
+        return self._starts
+
+    @property
+    def lengths(self):
+        return self._lengths
+
+    @property
+    def number_of_impulses(self):
+        return len(self._starts)
+
+    @staticmethod
+    def detect(values, threshold):
+        above = bytes(map(operator.gt, values, itertools.repeat(threshold)))
+        starts = array("q")
+        lengths = array("q")
+        start = above.find(1)
+        while start != -1:
+            end = above.find(0, start)
+            if end == -1:
+                end = len(above)
+            starts.append(start)
+            lengths.append(end - start)
+            start = above.find(1, end)
+        return ImpulseRuns(starts=starts, lengths=lengths)
+
+    def get_average_impulse_time(self, time_interval):
+        number_of_entries = sum(self._lengths) + len(self._starts)
+        return number_of_entries * time_interval / max(len(self._starts), 1)
+
+    def get_impulse_log(self, timestamps, values, summary=None):
+        impulse_timestamps = array("q")
+        impulse_values = array(values.typecode)
+        for start, length in zip(self._starts, self._lengths):
+            impulse_timestamps.extend(timestamps[start:start + length])
+            impulse_values.extend(values[start:start + length])
+        return TrafficLog(timestamps=impulse_timestamps, columns=[impulse_values], summary=summary)
+
+    def get_impulse_entries(self, timestamps, values):
+        entries = list()
+        for start, length in zip(self._starts, self._lengths):
+            entries.append(("impulse start",))
+            entries.extend(zip(timestamps[start:start + length], values[start:start + length]))
+        return entries
+
+
+class ImpulseFileParser:
+
+    @staticmethod
+    def parse_file(filename, use_mmap=False, cache=None):
+        if cache is not None:
+            return cache.get_traffic_logs(filename=filename,
+                                          parse=lambda file: ImpulseFileParser.parse_file(filename=file,
+                                                                                          use_mmap=use_mmap))
+        return ImpulseFileParser.parse_lines(lines=FileHandler.iterate_data_from_file(filename, use_mmap=use_mmap))
+
+    @staticmethod
+    def parse_lines(lines):
+        incoming_data = True
+        impulse_entries = (list(), list())
+        summaries = (list(), list())
+        for line in lines:
+            if "Incoming" in line:
+                incoming_data = True
+            elif "Outgoing" in line:
+                incoming_data = False
+            direction_idx = 0 if incoming_data else 1
+            if "impulse" not in line:
+                impulse_entries[direction_idx].append(line)
+            elif ImpulseFileParser._is_summary_line(line=line):
+                summaries[direction_idx].append(line.split(";"))
+        impulse_logs = list()
+        for entries, summary in zip(impulse_entries, summaries):
+            impulse_log = TrafficLogParser.parse_lines(lines=entries)
+            impulse_logs.append(TrafficLog(timestamps=impulse_log.timestamps, columns=impulse_log.columns,
+                                           header=impulse_log.header, summary=impulse_log.summary + summary))
+        return tuple(impulse_logs)
+
+    @staticmethod
+    def _is_summary_line(line):
+        return "Number of inc" in line or "Average inc" in line or "Number of outg" in line or "Average out" in line
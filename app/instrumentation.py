@@ -0,0 +1,275 @@
+import cProfile
+import datetime
+import io
+import json
+import os
+import platform
+import pstats
+import time
+import tracemalloc
+
+
+class Instrumentation:
+
+    VERSION = 1
+    _WORKER_STAGE = "worker"
+    enabled = False
+    trace_memory = False
+    profiled_stages = tuple()
+    profile_directory = None
+    profile_top_functions = 20
+    _measurements = list()
+    _active = list()
+
+    @staticmethod
+    def configure(enabled=True, trace_memory=False, profiled_stages=tuple(), profile_directory=None):
+        Instrumentation.enabled = enabled
+        Instrumentation.trace_memory = trace_memory
+        Instrumentation.profiled_stages = tuple(profiled_stages)
+        Instrumentation.profile_directory = profile_directory
+
+    @staticmethod
+    def get_options():
+        return {"enabled": Instrumentation.enabled, "trace_memory": Instrumentation.trace_memory,
+                "profiled_stages": Instrumentation.profiled_stages,
+                "profile_directory": Instrumentation.profile_directory}
+
+    @staticmethod
+    def measure_stage(name, **details):
+        if not Instrumentation.enabled:
+            return _DISABLED_MEASUREMENT
+        return InstrumentationMeasurement(name=name, details=details, is_file=False)
+
+    @staticmethod
+    def measure_file(filename):
+        if not Instrumentation.enabled:
+            return _DISABLED_MEASUREMENT
+        return InstrumentationMeasurement(name=str(filename), details=dict(), is_file=True)
+
+    @staticmethod
+    def add_io(rows_read=0, rows_written=0, bytes_read=0, bytes_written=0):
+        if not Instrumentation.enabled:
+            return
+        for measurement in Instrumentation._active:
+            measurement.add_io(rows_read=rows_read, rows_written=rows_written, bytes_read=bytes_read,
+                               bytes_written=bytes_written)
+
+    @staticmethod
+    def add_file_read(filename, rows_read=0):
+        if not Instrumentation.enabled:
+            return
+        try:
+            bytes_read = os.path.getsize(filename)
+        except OSError:
+            bytes_read = 0
+        Instrumentation.add_io(rows_read=rows_read, bytes_read=bytes_read)
+
+    @staticmethod
+    def count_rows_read(lines):
+        if not Instrumentation.enabled:
+            return lines
+        return Instrumentation._iterate_counting_rows(lines=lines)
+
+    @staticmethod
+    def _iterate_counting_rows(lines):
+        rows_read = 0
+        try:
+            for line in lines:
+                rows_read += 1
+                yield line
+        finally:
+            if hasattr(lines, "close"):
+                lines.close()
+            Instrumentation.add_io(rows_read=rows_read)
+
+    @staticmethod
+    def get_number_of_measurements():
+        return len(Instrumentation._measurements)
+
+    @staticmethod
+    def pop_measurements(start=0):
+        measurements = Instrumentation._measurements[start:]
+        del Instrumentation._measurements[start:]
+        return measurements
+
+    @staticmethod
+    def run_in_worker(options, function, **kwargs):
+        Instrumentation.configure(**options)
+        if not Instrumentation.enabled:
+            return function(**kwargs), list()
+        Instrumentation.reset()
+        with Instrumentation.measure_stage(name=Instrumentation._WORKER_STAGE):
+            result = function(**kwargs)
+        return result, Instrumentation.pop_measurements()
+
+    @staticmethod
+    def add_worker_measurements(measurements):
+        if not Instrumentation.enabled:
+            return
+        for measurement in measurements:
+            if measurement["name"] != Instrumentation._WORKER_STAGE:
+                Instrumentation._measurements.append(measurement)
+                continue
+            Instrumentation.add_io(rows_read=measurement["rows_read"], rows_written=measurement["rows_written"],
+                                   bytes_read=measurement["bytes_read"], bytes_written=measurement["bytes_written"])
+            Instrumentation.add_measurements(measurements=measurement["files"])
+
+    @staticmethod
+    def add_measurements(measurements):
+        if not Instrumentation.enabled:
+            return
+        for measurement in measurements:
+            if measurement["type"] == "stage":
+                Instrumentation._measurements.append(measurement)
+            elif Instrumentation.get_active_stage() is not None:
+                Instrumentation.get_active_stage().add_file(file_measurement=measurement)
+
+    @staticmethod
+    def get_active_stage():
+        for measurement in reversed(Instrumentation._active):
+            if not measurement.is_file:
+                return measurement
+        return None
+
+    @staticmethod
+    def reset():
+        Instrumentation._measurements = list()
+        Instrumentation._active = list()
+
+    @staticmethod
+    def get_report():
+        totals = dict()
+        for measurement in Instrumentation._measurements:
+            total = totals.setdefault(measurement["name"], {"count": 0, "wall_time_sec": 0.0, "cpu_time_sec": 0.0,
+                                                            "rows_read": 0, "rows_written": 0, "bytes_read": 0,
+                                                            "bytes_written": 0, "files": 0})
+            total["count"] += 1
+            for key in ("wall_time_sec", "cpu_time_sec", "rows_read", "rows_written", "bytes_read", "bytes_written"):
+                total[key] += measurement[key]
+            total["files"] += len(measurement["files"])
+        return {"version": Instrumentation.VERSION, "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(), "trace_memory": Instrumentation.trace_memory,
+                "stages": list(Instrumentation._measurements), "totals": totals}
+
+    @staticmethod
+    def save_report(filename):
+        from app.file_handler import FileWriter
+        report = json.dumps(Instrumentation.get_report(), indent=2).encode()
+        with FileWriter(filename=filename) as writer:
+            writer.write_bytes(data=report)
+
+
+class InstrumentationMeasurement:
+
+    def __init__(self, name, details, is_file):
+        self._name = name
+        self._details = details
+        self._is_file = is_file
+        self._rows_read = 0
+        self._rows_written = 0
+        self._bytes_read = 0
+        self._bytes_written = 0
+        self._files = list()
+        self._child_peak_memory = 0
+        self._owns_tracing = False
+        self._profile = None
+        self._start_time = 0.0
+        self._start_cpu_time = 0.0
+
+    def __enter__(self):
+        if Instrumentation.trace_memory and not self._is_file:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracing = True
+            InstrumentationMeasurement._report_peak_memory_to_parent(peak_memory=tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if not self._is_file and self._name in Instrumentation.profiled_stages:
+            self._profile = cProfile.Profile()
+        Instrumentation._active.append(self)
+        self._start_time = time.perf_counter()
+        self._start_cpu_time = time.process_time()
+        if self._profile is not None:
+            try:
+                self._profile.enable()
+            except ValueError:
+                self._profile = None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._profile is not None:
+            self._profile.disable()
+        measurement = {"type": "file" if self._is_file else "stage", "name": self._name,
+                       "wall_time_sec": time.perf_counter() - self._start_time,
+                       "cpu_time_sec": time.process_time() - self._start_cpu_time,
+                       "rows_read": self._rows_read, "rows_written": self._rows_written,
+                       "bytes_read": self._bytes_read, "bytes_written": self._bytes_written}
+        Instrumentation._active.remove(self)
+        if self._is_file:
+            Instrumentation.add_measurements(measurements=[measurement])
+            return
+        measurement["details"] = self._details
+        measurement["failed"] = exc_type is not None
+        measurement["files"] = self._files
+        measurement["peak_memory_kb"] = self._get_peak_memory_kb()
+        measurement["profile"] = self._get_profile()
+        Instrumentation._measurements.append(measurement)
+
+    def add_io(self, rows_read, rows_written, bytes_read, bytes_written):
+        self._rows_read += rows_read
+        self._rows_written += rows_written
+        self._bytes_read += bytes_read
+        self._bytes_written += bytes_written
+
+    def add_file(self, file_measurement):
+        self._files.append(file_measurement)
+
+    @staticmethod
+    def _report_peak_memory_to_parent(peak_memory):
+        parent = Instrumentation.get_active_stage()
+        if parent is not None:
+            parent.add_child_peak_memory(peak_memory=peak_memory)
+
+    @property
+    def is_file(self):
+        return self._is_file
+
+    def add_child_peak_memory(self, peak_memory):
+        self._child_peak_memory = max(self._child_peak_memory, peak_memory)
+
+    def _get_peak_memory_kb(self):
+        if not Instrumentation.trace_memory:
+            return None
+        peak_memory = max(tracemalloc.get_traced_memory()[1], self._child_peak_memory)
+        self._report_peak_memory_to_parent(peak_memory=peak_memory)
+        if self._owns_tracing:
+            tracemalloc.stop()
+        return peak_memory // 1024
+
+    def _get_profile(self):
+        if self._profile is None:
+            return None
+        profile = {"file": None, "functions": list()}
+        if Instrumentation.profile_directory is not None:
+            os.makedirs(Instrumentation.profile_directory, exist_ok=True)
+            profile["file"] = os.path.join(Instrumentation.profile_directory, "{}_{}_{}.prof".format(
+                self._name, os.getpid(), len(Instrumentation._measurements)))
+            self._profile.dump_stats(profile["file"])
+        stats = pstats.Stats(self._profile, stream=io.StringIO())
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        for (filename, line, function), (_, calls, total_time, cumulative_time, _) in \
+                functions[:Instrumentation.profile_top_functions]:
+            profile["functions"].append({"function": "{}:{}({})".format(filename, line, function), "calls": calls,
+                                         "total_time_sec": total_time, "cumulative_time_sec": cumulative_time})
+        return profile
+
+
+class _DisabledMeasurement:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_DISABLED_MEASUREMENT = _DisabledMeasurement()
@@ -0,0 +1,125 @@
+from app.data_handler import DataHandler
+from app.file_handler import FileHandler, FileWriter
+from app.log_organizer import LogOrganizer, LogOrganizerDataExporter
+
+
+class LogFollower:
+
+    def __init__(self, thresholds=(None, None), poll_interval_sec=1.0, max_idle_sec=None):
+        self._thresholds = thresholds
+        self._poll_interval_sec = poll_interval_sec
+        self._max_idle_sec = max_idle_sec
+        self._detectors = tuple()
+        self._impulse_filename = None
+        self._impulse_file = None
+        self._impulse_size = 0
+
+    @property
+    def detectors(self):
+        return self._detectors
+
+    @staticmethod
+    def get_impulse_file_name(node_name, time_interval_sec):
+        organized_filename = LogOrganizerDataExporter.get_file_name(node_name=node_name,
+                                                                    time_interval_sec=time_interval_sec)
+        return organized_filename[:-4] + "_live_impulses.csv"
+
+    def follow_log(self, filename, node_name, time_interval_sec):
+        self._detectors = (OnlineImpulseDetector(direction="incoming", column_idx=1, threshold=self._thresholds[0]),
+                           OnlineImpulseDetector(direction="outgoing", column_idx=2, threshold=self._thresholds[1]))
+        self._impulse_filename = LogFollower.get_impulse_file_name(node_name=node_name,
+                                                                   time_interval_sec=time_interval_sec)
+        self._impulse_file = None
+        organizer = LogOrganizer()
+        entries = organizer.iterate_log_incremental(filename=filename, node_name=node_name,
+                                                    time_interval_sec=time_interval_sec, follow=True,
+                                                    poll_interval_sec=self._poll_interval_sec,
+                                                    max_idle_sec=self._max_idle_sec, consumer=self)
+        try:
+            for entry in entries:
+                values = entry.split(";")
+                for detector in self._detectors:
+                    for impulse_entry in detector.process(values=values):
+                        self._write_impulse_entry(entry=impulse_entry)
+        finally:
+            entries.close()
+            if self._impulse_file is not None:
+                self._impulse_file.close()
+            for detector in self._detectors:
+                print("Number of {} impulses: {}".format(detector.direction, detector.number_of_impulses))
+
+    def get_state(self):
+        return {"impulse_size": self._impulse_size, "detectors": [detector.get_state() for detector in self._detectors]}
+
+    def set_state(self, state):
+        if state is None:
+            self._impulse_file = FileHandler.open_file_for_writing(filename=self._impulse_filename, buffer_size=1)
+            self._impulse_size = 0
+            return
+        for detector, detector_state in zip(self._detectors, state["detectors"]):
+            detector.set_state(state=detector_state)
+        self._impulse_file = open(self._impulse_filename, "a", buffering=1)
+        if self._impulse_file.tell() > state["impulse_size"]:
+            self._impulse_file.truncate(state["impulse_size"])
+        self._impulse_size = state["impulse_size"]
+
+    def _write_impulse_entry(self, entry):
+        line = FileWriter.format_entry(entry=entry) + "\n"
+        self._impulse_file.write(line)
+        self._impulse_size += len(line.encode())
+
+
+class OnlineImpulseDetector:
+
+    def __init__(self, direction, column_idx, threshold=None):
+        self._direction = direction
+        self._column_idx = column_idx
+        self._threshold = threshold
+        self._total = 0
+        self._number_of_values = 0
+        self._is_impulse = False
+        self._number_of_impulses = 0
+
+    @property
+    def direction(self):
+        return self._direction
+
+    @property
+    def number_of_impulses(self):
+        return self._number_of_impulses
+
+    @property
+    def threshold(self):
+        if self._threshold is not None:
+            return self._threshold
+        return self._total / max(self._number_of_values, 1)
+
+    def get_state(self):
+        return {"total": self._total, "number_of_values": self._number_of_values, "is_impulse": self._is_impulse,
+                "number_of_impulses": self._number_of_impulses}
+
+    def set_state(self, state):
+        self._total = state["total"]
+        self._number_of_values = state["number_of_values"]
+        self._is_impulse = state["is_impulse"]
+        self._number_of_impulses = state["number_of_impulses"]
+
+    def process(self, values):
+        if len(values) <= self._column_idx:
+            return list()
+        date = DataHandler.convert_to_number(value=values[0])
+        value = DataHandler.convert_to_number(value=values[self._column_idx])
+        if isinstance(date, str) or isinstance(value, str):
+            return list()
+        self._total += value
+        self._number_of_values += 1
+        if value <= self.threshold:
+            self._is_impulse = False
+            return list()
+        impulse_entries = list()
+        if not self._is_impulse:
+            impulse_entries.append([self._direction, "impulse start"])
+            self._number_of_impulses += 1
+            self._is_impulse = True
+        impulse_entries.append([self._direction, date, value])
+        return impulse_entries
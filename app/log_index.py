@@ -0,0 +1,107 @@
+import bisect
+import os
+import struct
+import sys
+from array import array
+
+from app.data_handler import DataHandler
+from app.file_handler import FileHandler, FileWriter
+
+
+class LogIndex:
+
+    class LogIndexError(Exception):
+        pass
+
+    _MAGIC = b"TLIX"
+    _VERSION = 1
+    _HEADER = struct.Struct("<4sIqqIQ")
+
+    def __init__(self, filename, step=256):
+        self._filename = filename
+        self._index_filename = filename + ".idx"
+        self._step = step
+        self._timestamps = array("q")
+        self._offsets = array("q")
+
+    @property
+    def index_filename(self):
+        return self._index_filename
+
+    @staticmethod
+    def get_index(filename, step=256):
+        if not os.path.isfile(filename):
+            raise LogIndex.LogIndexError("file: {} does not exist".format(filename))
+        log_index = LogIndex(filename=filename, step=step)
+        if not log_index._load():
+            log_index._build()
+            log_index._save()
+        return log_index
+
+    def find_offset(self, date):
+        if len(self._offsets) == 0:
+            return 0
+        idx = bisect.bisect_left(self._timestamps, date)
+        return self._offsets[max(idx - 1, 0)]
+
+    def iterate_lines(self, start_date=None):
+        offset = 0 if start_date is None else self.find_offset(date=start_date)
+        return FileHandler.iterate_data_from_offset(filename=self._filename, offset=offset)
+
+    def _get_file_stamp(self):
+        stat = os.stat(self._filename)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _build(self):
+        self._timestamps = array("q")
+        self._offsets = array("q")
+        number_of_entries = 0
+        max_date = None
+        for offset, line in FileHandler.iterate_data_with_offsets(filename=self._filename):
+            date = DataHandler.convert_to_number(value=line.split(";", 1)[0])
+            if not isinstance(date, int):
+                continue
+            if max_date is None or date > max_date:
+                max_date = date
+            if number_of_entries % self._step == 0:
+                self._timestamps.append(max_date)
+                self._offsets.append(offset)
+            number_of_entries += 1
+
+    def _load(self):
+        try:
+            with open(self._index_filename, "rb") as file:
+                header = file.read(LogIndex._HEADER.size)
+                magic, version, size, mtime_ns, step, count = LogIndex._HEADER.unpack(header)
+                if magic != LogIndex._MAGIC or version != LogIndex._VERSION or step != self._step:
+                    return False
+                if (size, mtime_ns) != self._get_file_stamp():
+                    return False
+                timestamps = array("q")
+                offsets = array("q")
+                timestamps.fromfile(file, count)
+                offsets.fromfile(file, count)
+        except (OSError, EOFError, struct.error):
+            return False
+        if sys.byteorder != "little":
+            timestamps.byteswap()
+            offsets.byteswap()
+        self._timestamps = timestamps
+        self._offsets = offsets
+        return True
+
+    def _save(self):
+        size, mtime_ns = self._get_file_stamp()
+        timestamps = array("q", self._timestamps)
+        offsets = array("q", self._offsets)
+        if sys.byteorder != "little":
+            timestamps.byteswap()
+            offsets.byteswap()
+        try:
+            with FileWriter(filename=self._index_filename) as writer:
+                writer.write_bytes(data=LogIndex._HEADER.pack(LogIndex._MAGIC, LogIndex._VERSION, size, mtime_ns,
+                                                              self._step, len(self._offsets)))
+                writer.write_bytes(data=timestamps)
+                writer.write_bytes(data=offsets)
+        except OSError:
+            pass
@@ -1,7 +1,15 @@
 import copy
+import json
+import os
+import shutil
+import tempfile
 
+from app.binary_log import BinaryLog
 from app.data_handler import DataHandler
-from app.file_handler import FileHandler
+from app.file_handler import FileFollower, FileHandler, FileWriter, LineReader, MappedLines
+from app.instrumentation import Instrumentation
+from app.raw_log_merger import RawLogMerger
+from app.traffic_log import TrafficLog, TrafficLogParser
 
 
 class LogOrganizer:
@@ -9,19 +17,30 @@ class LogOrganizer:
     class LogOrganizerError(Exception):
         pass
 
-    def __init__(self):
+    def __init__(self, use_mmap=False):
+        self._use_mmap = use_mmap
         self._raw_data = list()
-        self._organized_data = list()
+        self._consumer = None
+        self._organized_data = LogOrganizerData()
+        self._streaming = False
         self._node_name = str()
         self._time_interval_sec = int()
         self._current_entry_idx = int()
         self._last_entry_idx = int()
         self._number_of_columns = int()
+        self._raw_filename = None
+        self._raw_reader = None
+        self._organized_size = int()
+        self._checkpoint = None
 
     @property
     def organized_data(self):
         return self._organized_data
 
+    @property
+    def streaming(self):
+        return self._streaming
+
     @property
     def node_name(self):
         return self._node_name
@@ -30,17 +49,170 @@ class LogOrganizer:
     def time_interval_sec(self):
         return self._time_interval_sec
 
-    def organize_log(self, filename, node_name, time_interval_sec):
+    def organize_log(self, filename, node_name, time_interval_sec, streaming=False, use_array_backend=False):
+        if streaming:
+            self._organize_log_from_file(filename=filename, node_name=node_name, time_interval_sec=time_interval_sec,
+                                         streaming=True, use_array_backend=use_array_backend)
+            return
+        with Instrumentation.measure_stage("organize", file=filename, node=node_name,
+                                           time_interval_sec=time_interval_sec):
+            self._organize_log_from_file(filename=filename, node_name=node_name, time_interval_sec=time_interval_sec,
+                                         streaming=streaming, use_array_backend=use_array_backend)
+
+    def _organize_log_from_file(self, filename, node_name, time_interval_sec, streaming, use_array_backend):
         self._node_name = node_name
         self._time_interval_sec = time_interval_sec
+        self._streaming = streaming
+        if streaming:
+            self._organize_log_streaming(filename=filename)
+            return
+        if use_array_backend:
+            self._organize_log_with_array_backend(filename=filename)
+            return
         try:
             self._get_data(filename=filename)
         except FileNotFoundError:
             raise LogOrganizer.LogOrganizerError("file: {} does not exist".format(filename))
-        self._organize_log()
+        try:
+            self._organize_log()
+        finally:
+            self._release_data()
+
+    def organize_log_to_traffic_log(self, filename, node_name, time_interval_sec, export=False):
+        with Instrumentation.measure_stage("organize", file=filename, node=node_name,
+                                           time_interval_sec=time_interval_sec):
+            self._organize_log_from_file(filename=filename, node_name=node_name, time_interval_sec=time_interval_sec,
+                                         streaming=True, use_array_backend=False)
+            try:
+                if not export:
+                    return TrafficLogParser.parse_lines(lines=self._organized_data)
+                organized_filename = LogOrganizerDataExporter.get_file_name(node_name=node_name,
+                                                                            time_interval_sec=time_interval_sec)
+                with FileWriter(filename=organized_filename) as writer:
+                    return TrafficLogParser.parse_lines(lines=writer.iterate_entries(entries=self._organized_data))
+            except TrafficLog.TrafficLogError as e:
+                raise LogOrganizer.LogOrganizerError(str(e))
+
+    def organize_log_intervals(self, filename, node_name, time_intervals_sec):
+        with Instrumentation.measure_stage("organize", file=filename, node=node_name,
+                                           time_intervals_sec=list(time_intervals_sec)):
+            self._organize_log_intervals(filename=filename, node_name=node_name,
+                                         time_intervals_sec=time_intervals_sec)
+
+    def _organize_log_intervals(self, filename, node_name, time_intervals_sec):
+        if len(time_intervals_sec) == 0:
+            raise LogOrganizer.LogOrganizerError("no time intervals to organize log with")
+        for time_interval_sec in sorted(set(time_intervals_sec)):
+            try:
+                entries = FileHandler.iterate_data_from_file(filename=filename, use_mmap=self._use_mmap)
+            except FileNotFoundError:
+                raise LogOrganizer.LogOrganizerError("file: {} does not exist".format(filename))
+            self._organize_entries(entries=entries, node_name=node_name, time_interval_sec=time_interval_sec)
+
+    def organize_logs(self, filenames, node_name, time_intervals_sec, memory_budget=None, chunk_directory=None):
+        if len(time_intervals_sec) == 0:
+            raise LogOrganizer.LogOrganizerError("no time intervals to organize log with")
+        with Instrumentation.measure_stage("organize", files=list(filenames), node=node_name,
+                                           time_intervals_sec=list(time_intervals_sec)):
+            try:
+                merger = RawLogMerger(memory_budget=memory_budget, chunk_directory=chunk_directory)
+                if len(set(time_intervals_sec)) == 1:
+                    self._organize_entries(entries=merger.merge(filenames=filenames), node_name=node_name,
+                                           time_interval_sec=time_intervals_sec[0])
+                else:
+                    self._organize_merged_logs(merger=merger, filenames=filenames, node_name=node_name,
+                                               time_intervals_sec=time_intervals_sec, chunk_directory=chunk_directory)
+            except RawLogMerger.RawLogMergerError as e:
+                raise LogOrganizer.LogOrganizerError(str(e))
+        return merger
+
+    def _organize_merged_logs(self, merger, filenames, node_name, time_intervals_sec, chunk_directory):
+        directory = tempfile.mkdtemp(prefix="organize_logs_", dir=chunk_directory)
+        try:
+            merged_filename = merger.merge_to_file(filenames=filenames, filename=os.path.join(directory, "merged.csv"))
+            self._organize_log_intervals(filename=merged_filename, node_name=node_name,
+                                         time_intervals_sec=time_intervals_sec)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _organize_entries(self, entries, node_name, time_interval_sec):
+        self._node_name = node_name
+        self._time_interval_sec = time_interval_sec
+        self._streaming = True
+        self._organized_data = LogOrganizerResampler(time_interval_sec=time_interval_sec).resample(raw_data=entries)
+        FileHandler.write_data_to_file(data=self._organized_data, filename=LogOrganizerDataExporter.get_file_name(
+            node_name=node_name, time_interval_sec=time_interval_sec))
+
+    def organize_log_incremental(self, filename, node_name, time_interval_sec):
+        with Instrumentation.measure_stage("organize", file=filename, node=node_name,
+                                           time_interval_sec=time_interval_sec, incremental=True):
+            for _ in self.iterate_log_incremental(filename=filename, node_name=node_name,
+                                                  time_interval_sec=time_interval_sec):
+                pass
+
+    def iterate_log_incremental(self, filename, node_name, time_interval_sec, follow=False, poll_interval_sec=1.0,
+                                max_idle_sec=None, consumer=None):
+        self._node_name = node_name
+        self._time_interval_sec = time_interval_sec
+        if not os.path.isfile(filename):
+            raise LogOrganizer.LogOrganizerError("file: {} does not exist".format(filename))
+        organized_filename = LogOrganizerDataExporter.get_file_name(node_name=node_name,
+                                                                    time_interval_sec=time_interval_sec)
+        checkpoint = LogOrganizerCheckpoint.load(organized_filename=organized_filename, raw_filename=filename,
+                                                 time_interval_sec=time_interval_sec)
+        if checkpoint is not None and not checkpoint.matches_raw_log(raw_filename=filename):
+            print("Checkpoint of {} doesn't match raw log, organizing whole log.".format(organized_filename))
+            checkpoint = None
+        self._consumer = consumer
+        if consumer is not None:
+            consumer.set_state(state=checkpoint.consumer_state if checkpoint else None)
+        raw_offset = checkpoint.raw_offset if checkpoint else 0
+        if follow:
+            self._raw_reader = FileFollower(filename=filename, offset=raw_offset, poll_interval_sec=poll_interval_sec,
+                                            max_idle_sec=max_idle_sec)
+        else:
+            self._raw_reader = LineReader(filename=filename, offset=raw_offset)
+        raw_data = iter(self._raw_reader)
+        if checkpoint is not None:
+            next(raw_data)
+            file = open(organized_filename, "r+", buffering=1 if follow else -1)
+            file.truncate(checkpoint.organized_size)
+            file.seek(checkpoint.organized_size)
+            self._organized_size = checkpoint.organized_size
+        else:
+            file = FileHandler.open_file_for_writing(filename=organized_filename, buffer_size=1 if follow else -1)
+            self._organized_size = 0
+        self._raw_filename = filename
+        self._checkpoint = None
+        resampler = LogOrganizerResampler(time_interval_sec=time_interval_sec)
+        try:
+            with self._raw_reader, file:
+                for entry in resampler.resample(raw_data=raw_data, state=checkpoint.state if checkpoint else None,
+                                                on_step=self._set_checkpoint):
+                    file.write(entry)
+                    file.write("\n")
+                    self._organized_size += len(entry.encode()) + 1
+                    yield entry
+        finally:
+            if self._checkpoint is not None:
+                self._checkpoint.save(organized_filename=organized_filename)
+            else:
+                LogOrganizerCheckpoint.remove(organized_filename=organized_filename)
+
+    def _set_checkpoint(self, state):
+        self._checkpoint = LogOrganizerCheckpoint(raw_filename=self._raw_filename,
+                                                  time_interval_sec=self._time_interval_sec,
+                                                  raw_offset=self._raw_reader.line_offset,
+                                                  organized_size=self._organized_size, state=state,
+                                                  consumer_state=self._consumer.get_state() if self._consumer else None)
 
     def _get_data(self, filename):
-        self._raw_data = FileHandler.get_data_from_file(filename=filename)
+        self._raw_data = FileHandler.get_data_from_file(filename=filename, use_mmap=self._use_mmap)
+
+    def _release_data(self):
+        if isinstance(self._raw_data, MappedLines):
+            self._raw_data.close()
+        self._raw_data = list()
 
     def _organize_log(self):
         self._get_number_of_columns()
@@ -52,6 +224,28 @@ class LogOrganizer:
                 break
         print("Finished organizing log using time interval of {} seconds.".format(self._time_interval_sec))
 
+    def _organize_log_with_array_backend(self, filename):
+        try:
+            self._get_data(filename=filename)
+        except FileNotFoundError:
+            raise LogOrganizer.LogOrganizerError("file: {} does not exist".format(filename))
+        try:
+            traffic_log = TrafficLogParser.parse_lines(lines=self._raw_data)
+            backend = LogOrganizerArrayBackend(time_interval_sec=self._time_interval_sec)
+            self._organized_data = backend.organize(traffic_log=traffic_log, lines=self._raw_data)
+        except TrafficLog.TrafficLogError as e:
+            raise LogOrganizer.LogOrganizerError(str(e))
+        finally:
+            self._release_data()
+
+    def _organize_log_streaming(self, filename):
+        try:
+            raw_data = FileHandler.iterate_data_from_file(filename=filename, use_mmap=self._use_mmap)
+        except FileNotFoundError:
+            raise LogOrganizer.LogOrganizerError("file: {} does not exist".format(filename))
+        resampler = LogOrganizerResampler(time_interval_sec=self._time_interval_sec)
+        self._organized_data = resampler.resample(raw_data=raw_data)
+
     def _get_number_of_columns(self):
         first_entry = self._get_entry_at_idx(idx=0)
         first_entry = first_entry.split(";")
@@ -86,21 +280,23 @@ class LogOrganizer:
         except LogOrganizer.LogOrganizerError:
             return False
         if self._approximate_next_entry_date() < next_entry_date:
-            self._create_duplicate_entry()
+            self._create_duplicate_entries(next_entry_date=next_entry_date)
         elif self._approximate_next_entry_date() == next_entry_date:
             self._create_new_entry()
         else:
             self._create_averaged_entry()
         return True
 
-    def _create_duplicate_entry(self):
+    def _create_duplicate_entries(self, next_entry_date):
         try:
-            new_entry = copy.deepcopy(self._get_entry_at_idx(idx=self._current_entry_idx))
+            entry = self._get_entry_at_idx(idx=self._current_entry_idx)
         except LogOrganizer.LogOrganizerError:
             raise LogOrganizer.LogOrganizerError("can't create duplicate data entry due to incorrect entry index: {}"
                                                  .format(self._current_entry_idx))
-        new_entry = self._set_approximate_date_for_entry(entry=new_entry)
-        self._organized_data.append(new_entry)
+        first_date = self._approximate_next_entry_date()
+        number_of_entries = -(-(next_entry_date - first_date) // self._time_interval_sec)
+        self._organized_data.append_run(entry=entry, first_date=first_date, number_of_entries=number_of_entries,
+                                        time_interval_sec=self._time_interval_sec)
 
     def _set_approximate_date_for_entry(self, entry):
         new_entry_date = self._approximate_next_entry_date()
@@ -165,7 +361,7 @@ class LogOrganizer:
         return self._get_last_entry_date() + self._time_interval_sec
 
     def _get_last_entry_date(self):
-        last_organized_entry = self._organized_data[-1]
+        last_organized_entry = self._organized_data.get_last_entry()
         date_of_last_organized_entry = last_organized_entry.split(";")[0]
         return DataHandler.convert_to_number(date_of_last_organized_entry)
 
@@ -174,14 +370,380 @@ class LogOrganizer:
         return DataHandler.convert_to_number(entry_date)
 
 
+class LogOrganizerData:
+
+    def __init__(self):
+        self._entries = list()
+        self._number_of_entries = 0
+
+    def __len__(self):
+        return self._number_of_entries
+
+    def __iter__(self):
+        for entry in self._entries:
+            if isinstance(entry, LogOrganizerGapRun):
+                yield from entry
+            else:
+                yield entry
+
+    def append(self, entry):
+        self._entries.append(entry)
+        self._number_of_entries += 1
+
+    def append_run(self, entry, first_date, number_of_entries, time_interval_sec):
+        if number_of_entries == 1:
+            self.append(entry=LogOrganizerResampler.set_date_for_entry(entry=entry, date=first_date))
+        elif number_of_entries > 1:
+            self._entries.append(LogOrganizerGapRun(entry=entry, first_date=first_date,
+                                                    number_of_entries=number_of_entries,
+                                                    time_interval_sec=time_interval_sec))
+            self._number_of_entries += number_of_entries
+
+    def get_last_entry(self):
+        try:
+            entry = self._entries[-1]
+        except IndexError:
+            raise LogOrganizer.LogOrganizerError("no organized entries to retrieve last entry from")
+        if isinstance(entry, LogOrganizerGapRun):
+            return entry.last_entry
+        return entry
+
+
+class LogOrganizerGapRun:
+
+    def __init__(self, entry, first_date, number_of_entries, time_interval_sec):
+        _, separator, values = entry.partition(";")
+        self._values = separator + values
+        self._first_date = first_date
+        self._number_of_entries = number_of_entries
+        self._time_interval_sec = time_interval_sec
+
+    def __len__(self):
+        return self._number_of_entries
+
+    def __iter__(self):
+        date = self._first_date
+        for _ in range(self._number_of_entries):
+            yield DataHandler.convert_to_string(value=date) + self._values
+            date += self._time_interval_sec
+
+    @property
+    def first_date(self):
+        return self._first_date
+
+    @property
+    def last_date(self):
+        return self._first_date + (self._number_of_entries - 1) * self._time_interval_sec
+
+    @property
+    def last_entry(self):
+        return DataHandler.convert_to_string(value=self.last_date) + self._values
+
+
+class LogOrganizerResampler:
+
+    def __init__(self, time_interval_sec):
+        self._time_interval_sec = time_interval_sec
+        self._raw_data = iter(())
+        self._current_entry = str()
+        self._next_entry = None
+        self._current_entry_idx = int()
+        self._last_entry_date = int()
+        self._number_of_columns = int()
+
+    def resample(self, raw_data, state=None, on_step=None):
+        self._raw_data = iter(raw_data)
+        if state is not None:
+            self._set_state(state=state)
+        else:
+            if not self._create_first_entry():
+                raise LogOrganizer.LogOrganizerError("incorrect entry index: 0 when retrieving entry data")
+            yield self._add_entry(entry=self._current_entry)
+        while self._next_entry is not None:
+            if on_step is not None:
+                on_step(self.get_state())
+            yield self._create_next_entry()
+        print("Finished organizing log using time interval of {} seconds.".format(self._time_interval_sec))
+
+    def get_state(self):
+        return {"current_entry": self._current_entry, "next_entry": self._next_entry,
+                "current_entry_idx": self._current_entry_idx, "last_entry_date": self._last_entry_date,
+                "number_of_columns": self._number_of_columns}
+
+    def _set_state(self, state):
+        self._current_entry = state["current_entry"]
+        self._next_entry = state["next_entry"]
+        self._current_entry_idx = state["current_entry_idx"]
+        self._last_entry_date = state["last_entry_date"]
+        self._number_of_columns = state["number_of_columns"]
+
+    def _create_first_entry(self):
+        first_entry = next(self._raw_data, None)
+        if first_entry is None:
+            return False
+        self._number_of_columns = len(first_entry.split(";"))
+        entry = first_entry
+        while not self._is_data_entry(entry=entry):
+            entry = next(self._raw_data, None)
+            if entry is None:
+                self._current_entry = first_entry
+                self._current_entry_idx = 0
+                return True
+            self._current_entry_idx += 1
+        self._current_entry = entry
+        self._next_entry = next(self._raw_data, None)
+        return True
+
+    @staticmethod
+    def _is_data_entry(entry):
+        for value in entry.split(";"):
+            if isinstance(DataHandler.convert_to_number(value=value), str):
+                return False
+        return True
+
+    def _create_next_entry(self):
+        approximate_date = self._last_entry_date + self._time_interval_sec
+        next_entry_date = self._get_entry_date(entry=self._next_entry)
+        if approximate_date < next_entry_date:
+            new_entry = self.set_date_for_entry(entry=self._current_entry, date=approximate_date)
+        elif approximate_date == next_entry_date:
+            new_entry = self._current_entry
+            self._advance()
+        else:
+            new_entry = self._create_averaged_entry(approximate_date=approximate_date)
+        return self._add_entry(entry=new_entry)
+
+    def _advance(self):
+        self._current_entry = self._next_entry
+        self._current_entry_idx += 1
+        self._next_entry = next(self._raw_data, None)
+
+    def _add_entry(self, entry):
+        self._last_entry_date = self._get_entry_date(entry=entry)
+        return entry
+
+    def _create_averaged_entry(self, approximate_date):
+        totals = [0] * self._number_of_columns
+        self._add_to_totals(totals=totals, entry=self._current_entry)
+        number_of_entries = 1
+        while self._next_entry is not None:
+            self._advance()
+            entry = self._current_entry
+            number_of_entries += 1
+            if approximate_date > self._get_entry_date(entry=entry):
+                self._add_to_totals(totals=totals, entry=entry)
+            else:
+                self._add_to_totals(totals=totals, entry=self.set_date_for_entry(entry=entry, date=approximate_date))
+                break
+        averaged_entry = [DataHandler.convert_to_int(column / number_of_entries) for column in totals]
+        return self.set_date_for_entry(entry=averaged_entry, date=approximate_date)
+
+    def _add_to_totals(self, totals, entry):
+        try:
+            for idx, column in enumerate(entry.split(";")):
+                totals[idx] += DataHandler.convert_to_float(column)
+        except IndexError:
+            raise LogOrganizer.LogOrganizerError("incorrect number of data columns at entry index: {}"
+                                                 .format(self._current_entry_idx))
+
+    @staticmethod
+    def set_date_for_entry(entry, date):
+        date = DataHandler.convert_to_string(value=date)
+        if isinstance(entry, str):
+            return ";".join([date] + entry.split(";")[1:])
+        return ";".join([date] + [DataHandler.convert_to_string(value=value) for value in entry[1:]])
+
+    @staticmethod
+    def _get_entry_date(entry):
+        entry_date = entry.split(";")[0]
+        return DataHandler.convert_to_number(entry_date)
+
+
+class LogOrganizerArrayBackend:
+
+    def __init__(self, time_interval_sec):
+        if time_interval_sec <= 0:
+            raise LogOrganizer.LogOrganizerError("time interval must be positive, got: {}".format(time_interval_sec))
+        self._time_interval_sec = time_interval_sec
+        self._traffic_log = TrafficLog()
+        self._lines = None
+        self._number_of_columns = int()
+        self._organized_data = LogOrganizerData()
+
+    def organize(self, traffic_log, lines=None):
+        self._traffic_log = traffic_log
+        self._lines = lines
+        if len(traffic_log) == 0:
+            raise LogOrganizer.LogOrganizerError("incorrect entry index: 0 when retrieving entry data")
+        self._get_number_of_columns()
+        self._organize()
+        print("Finished organizing log using time interval of {} seconds.".format(self._time_interval_sec))
+        return self._organized_data
+
+    def _get_number_of_columns(self):
+        if len(self._traffic_log.header) > 0:
+            self._number_of_columns = len(self._traffic_log.header[0])
+        else:
+            self._number_of_columns = self._traffic_log.number_of_columns
+        if self._traffic_log.number_of_columns > self._number_of_columns:
+            raise LogOrganizer.LogOrganizerError("incorrect number of data columns at entry index: {}"
+                                                 .format(len(self._traffic_log.header)))
+
+    def _organize(self):
+        dates = self._traffic_log.timestamps
+        self._organized_data = LogOrganizerData()
+        self._organized_data.append(self._get_entry(idx=0))
+        number_of_entries = len(dates)
+        current_idx = 0
+        last_date = dates[0]
+        while current_idx + 1 < number_of_entries:
+            approximate_date = last_date + self._time_interval_sec
+            next_entry_date = dates[current_idx + 1]
+            if approximate_date < next_entry_date:
+                last_date = self._create_duplicate_entries(idx=current_idx, first_date=approximate_date,
+                                                           end_date=next_entry_date)
+            elif approximate_date == next_entry_date:
+                self._organized_data.append(self._get_entry(idx=current_idx))
+                last_date = dates[current_idx]
+                current_idx += 1
+            else:
+                current_idx = self._create_averaged_entry(idx=current_idx, date=approximate_date)
+                last_date = approximate_date
+
+    def _get_entry(self, idx):
+        if self._lines is None:
+            return self._format_entry(idx=idx)
+        return self._lines[len(self._traffic_log.header) + idx]
+
+    def _format_entry(self, idx):
+        return ";".join([str(self._traffic_log.timestamps[idx])] + [DataHandler.format_value(value=column[idx])
+                                                                    for column in self._traffic_log.columns])
+
+    def _create_duplicate_entries(self, idx, first_date, end_date):
+        number_of_duplicates = (end_date - first_date + self._time_interval_sec - 1) // self._time_interval_sec
+        self._organized_data.append_run(entry=self._get_entry(idx=idx), first_date=first_date,
+                                        number_of_entries=number_of_duplicates,
+                                        time_interval_sec=self._time_interval_sec)
+        return first_date + (number_of_duplicates - 1) * self._time_interval_sec
+
+    def _create_averaged_entry(self, idx, date):
+        last_idx = self._find_bucket_end(idx=idx, date=date)
+        number_of_entries = last_idx - idx + 1
+        averaged_entry = [str(date)]
+        for column in self._traffic_log.columns:
+            averaged_entry.append(str(int(sum(column[idx:last_idx + 1]) / number_of_entries)))
+        averaged_entry += ["0"] * (self._number_of_columns - len(averaged_entry))
+        self._organized_data.append(";".join(averaged_entry))
+        return last_idx
+
+    def _find_bucket_end(self, idx, date):
+        return min(self._traffic_log.find_date(date=date, start=idx + 1), len(self._traffic_log) - 1)
+
+
+class LogOrganizerCheckpoint:
+
+    _VERSION = 1
+
+    def __init__(self, raw_filename, time_interval_sec, raw_offset, organized_size, state, consumer_state=None):
+        self._raw_filename = os.path.abspath(raw_filename)
+        self._time_interval_sec = time_interval_sec
+        self._raw_offset = raw_offset
+        self._organized_size = organized_size
+        self._state = state
+        self._consumer_state = consumer_state
+
+    @property
+    def raw_offset(self):
+        return self._raw_offset
+
+    @property
+    def organized_size(self):
+        return self._organized_size
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def consumer_state(self):
+        return self._consumer_state
+
+    @staticmethod
+    def get_file_name(organized_filename):
+        return organized_filename + ".checkpoint"
+
+    @staticmethod
+    def load(organized_filename, raw_filename, time_interval_sec):
+        try:
+            with open(LogOrganizerCheckpoint.get_file_name(organized_filename=organized_filename), "r") as file:
+                data = json.load(file)
+            if data["version"] != LogOrganizerCheckpoint._VERSION:
+                return None
+            if data["raw_filename"] != os.path.abspath(raw_filename) or data["time_interval_sec"] != time_interval_sec:
+                return None
+            if os.path.getsize(organized_filename) < data["organized_size"]:
+                return None
+            return LogOrganizerCheckpoint(raw_filename=data["raw_filename"], time_interval_sec=time_interval_sec,
+                                          raw_offset=data["raw_offset"], organized_size=data["organized_size"],
+                                          state=data["state"], consumer_state=data.get("consumer_state"))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def matches_raw_log(self, raw_filename):
+        try:
+            with LineReader(filename=raw_filename, offset=self._raw_offset) as reader:
+                return next(iter(reader), None) == self._state["next_entry"]
+        except (OSError, UnicodeDecodeError):
+            return False
+
+    def save(self, organized_filename):
+        data = {"version": LogOrganizerCheckpoint._VERSION, "raw_filename": self._raw_filename,
+                "time_interval_sec": self._time_interval_sec, "raw_offset": self._raw_offset,
+                "organized_size": self._organized_size, "state": self._state,
+                "consumer_state": self._consumer_state}
+        with FileWriter(filename=LogOrganizerCheckpoint.get_file_name(organized_filename=organized_filename)) as writer:
+            writer.write(entry=json.dumps(data))
+
+    @staticmethod
+    def remove(organized_filename):
+        try:
+            os.remove(LogOrganizerCheckpoint.get_file_name(organized_filename=organized_filename))
+        except FileNotFoundError:
+            pass
+
+
 class LogOrganizerDataExporter:
 
     @staticmethod
-    def export_data(log_organizer):
+    def export_data(log_organizer, binary=False):
         if not isinstance(log_organizer, LogOrganizer):
             raise LogOrganizer.LogOrganizerError("incorrect object type to export log data from")
+        with Instrumentation.measure_stage("organize_export" if log_organizer.streaming else "export",
+                                           node=log_organizer.node_name,
+                                           time_interval_sec=log_organizer.time_interval_sec, binary=binary):
+            LogOrganizerDataExporter._export_data(log_organizer=log_organizer, binary=binary)
+
+    @staticmethod
+    def _export_data(log_organizer, binary):
         organized_data = log_organizer.organized_data
-        filename = "data/" + log_organizer.node_name + "/log_organized_"
-        time_interval = DataHandler.convert_to_string(log_organizer.time_interval_sec)
-        filename += time_interval + ".csv"
-        FileHandler.write_data_to_file(data=organized_data, filename=filename)
+        filename = LogOrganizerDataExporter.get_file_name(node_name=log_organizer.node_name,
+                                                          time_interval_sec=log_organizer.time_interval_sec,
+                                                          binary=binary)
+        if not binary:
+            FileHandler.write_data_to_file(data=organized_data, filename=filename)
+            return
+        try:
+            traffic_log = TrafficLogParser.parse_lines(lines=organized_data, raw_metadata=True)
+        except TrafficLog.TrafficLogError as e:
+            raise LogOrganizer.LogOrganizerError(str(e))
+        binary_log = BinaryLog(timestamps=traffic_log.timestamps, columns=traffic_log.columns,
+                               header=traffic_log.header, summary=traffic_log.summary,
+                               time_interval_sec=log_organizer.time_interval_sec, node_name=log_organizer.node_name)
+        FileHandler.write_binary_log_to_file(binary_log=binary_log, filename=filename)
+
+    @staticmethod
+    def get_file_name(node_name, time_interval_sec, binary=False):
+        filename = "data/" + node_name + "/log_organized_"
+        time_interval = DataHandler.convert_to_string(time_interval_sec)
+        filename += time_interval + (BinaryLog.EXTENSION if binary else ".csv")
+        return filename
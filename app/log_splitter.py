@@ -1,58 +1,159 @@
 import calendar
 import datetime
+import itertools
+import math
+import os
 
+from app.binary_log import BinaryLog
 from app.data_handler import DataHandler
-from app.file_handler import FileHandler
+from app.file_handler import FileHandler, FileWriter
+from app.instrumentation import Instrumentation
+from app.log_index import LogIndex
+from app.traffic_log import TrafficLog, TrafficLogParser
 
 
 class LogSplitter:
 
+    class LogSplitterError(Exception):
+        pass
+
     def __init__(self, data_file, print_avg_and_max=False, first_column_avg=None, last_column_avg=None,
-                 first_column_max=None, last_column_max=None):
+                 first_column_max=None, last_column_max=None, streaming=False, max_open_files=1,
+                 buffer_size=65536, use_index=False, use_mmap=False, traffic_log=None, write_files=True,
+                 keep_split_logs=False, compression=None, binary=False, percentiles=tuple()):
         self._print_avg_and_max = print_avg_and_max
         self._first_column_avg = first_column_avg
         self._last_column_avg = last_column_avg
         self._first_column_max = first_column_max
         self._last_column_max = last_column_max
+        self._streaming = streaming or use_index
+        self._max_open_files = max_open_files
+        self._buffer_size = buffer_size
+        self._use_index = use_index
+        self._use_mmap = use_mmap
+        self._write_files = write_files
+        self._keep_split_logs = keep_split_logs
+        self._binary = binary
+        self._percentiles = tuple(percentiles)
+        self._accumulators = list()
+        self._file_extension = BinaryLog.EXTENSION if binary else ".csv"
+        if any(not 0 < percentile < 100 for percentile in self._percentiles):
+            raise LogSplitter.LogSplitterError("percentiles must be between 0 and 100, got: {}".format(percentiles))
+        if len(self._percentiles) > 0 and not print_avg_and_max:
+            raise LogSplitter.LogSplitterError("percentiles can only be printed with averages and maximums")
+        if binary and (compression is not None or self._streaming):
+            raise LogSplitter.LogSplitterError("binary logs can only be split without compression and streaming")
+        if compression is not None:
+            self._file_extension += compression if compression.startswith(".") else "." + compression
+            if FileHandler.get_compression(filename=self._file_extension) is None:
+                raise LogSplitter.LogSplitterError("unsupported compression: {}".format(compression))
+        self._split_logs = list()
+        if self._streaming and (traffic_log is not None or keep_split_logs or not write_files):
+            raise LogSplitter.LogSplitterError("logs can only be split in memory when not streaming")
+        if traffic_log is not None:
+            self._file_path = data_file.rsplit(sep="/", maxsplit=1)[0]
+            self._data = traffic_log.as_integers()
+            return
+        if not os.path.isfile(data_file):
+            raise LogSplitter.LogSplitterError("file: {} does not exist".format(data_file))
+        self._data_file = data_file
+        self._data = None
+        self._file_path = data_file.rsplit(sep="/", maxsplit=1)[0]
+
+    def _parse_data(self):
         try:
-            data = FileHandler.get_data_from_file(filename=data_file)
+            data = TrafficLogParser.parse_file(filename=self._data_file, use_mmap=self._use_mmap)
         except FileNotFoundError:
-            print("File {} does not exist. Exiting program.".format(data_file))
-        else:
-            self._file_path = data_file.rsplit(sep="/", maxsplit=1)[0]
-            data = [line.split(";") for line in data]
-            data = [[DataHandler.convert_to_float(value=item) for item in line] for line in data]
-            data = [[DataHandler.convert_to_int(value=item) for item in line] for line in data]
-            self._data = data
+            raise LogSplitter.LogSplitterError("file: {} does not exist".format(self._data_file))
+        except TrafficLog.TrafficLogError as e:
+            raise LogSplitter.LogSplitterError("file: {} could not be parsed: {}".format(self._data_file, e))
+        self._data = data.as_integers()
+
+    @property
+    def split_logs(self):
+        return self._split_logs
+
+    @property
+    def accumulators(self):
+        return self._accumulators
 
     def split_log(self, time_interval_in_seconds=None, start_date=None, end_date=None):
+        with Instrumentation.measure_stage("split", directory=self._file_path,
+                                           time_interval_sec=time_interval_in_seconds, start_date=start_date,
+                                           end_date=end_date, streaming=self._streaming):
+            self._split_log(time_interval_in_seconds=time_interval_in_seconds, start_date=start_date,
+                            end_date=end_date)
+
+    def _split_log(self, time_interval_in_seconds, start_date, end_date):
+        if not self._streaming and self._data is None:
+            self._parse_data()
+        if not self._streaming and len(self._data) == 0:
+            raise LogSplitter.LogSplitterError("no data entries")
         if time_interval_in_seconds is not None:
-            self._split_log_by_intervals(time_interval_in_seconds=time_interval_in_seconds)
+            if self._streaming:
+                self._split_log_by_intervals_streaming(time_interval_in_seconds=time_interval_in_seconds)
+            else:
+                self._split_log_by_intervals(time_interval_in_seconds=time_interval_in_seconds)
         elif start_date is not None or end_date is not None:
-            self._split_log_by_date(start_date=start_date, end_date=end_date)
+            if self._streaming:
+                self._split_log_by_date_streaming(start_date=start_date, end_date=end_date)
+            else:
+                self._split_log_by_date(start_date=start_date, end_date=end_date)
         else:
-            print("Insufficient parameter data. Exiting program.")
-            exit(1)
+            raise LogSplitter.LogSplitterError("insufficient parameter data to split log")
 
     def _split_log_by_intervals(self, time_interval_in_seconds):
-        current_time = self._data[0][0]
+        current_time = self._data.timestamps[0]
         file_number = 0
         current_index = 0
         while True:
             file_number += 1
             current_time += time_interval_in_seconds
-            split_data = list()
-            filename = self._get_file_name(time_interval_in_seconds, file_number)
-            for idx, line in enumerate(self._data[current_index:], start=current_index):
-                if line[0] >= current_time:
-                    current_index = idx
-                    self._create_split_log(data=split_data, filename=filename)
-                    break
-                split_data.append(line)
-            else:
+            next_index = self._data.find_date(date=current_time, start=current_index)
+            if next_index >= len(self._data):
                 return
+            filename = self._get_file_name(time_interval_in_seconds, file_number)
+            split_data = list(self._data.rows(start=current_index, end=next_index))
+            self._create_split_log(data=split_data, filename=filename)
+            current_index = next_index
 
-    def _get_file_name(self, time_interval_in_seconds, file_number):
+    def _split_log_by_intervals_streaming(self, time_interval_in_seconds):
+        pool = LogSplitterWriterPool(create_writer=lambda window: self._create_bucket_writer(
+            filename=self._get_file_name(time_interval_in_seconds, window + 1)), max_open_files=self._max_open_files)
+        first_time = None
+        try:
+            for entry in self._get_data_entries():
+                if first_time is None:
+                    first_time = entry[0]
+                pool.write(window=(entry[0] - first_time) // time_interval_in_seconds, entry=entry)
+            if first_time is None:
+                raise LogSplitter.LogSplitterError("no data entries")
+            pool.finalize_until(window=pool.last_window - 1)
+        finally:
+            pool.close()
+
+    def _get_data_entries(self, start_date=None):
+        if self._use_index and start_date is not None and not BinaryLog.is_binary_log(filename=self._data_file):
+            lines = LogIndex.get_index(filename=self._data_file).iterate_lines(start_date=int(start_date))
+        else:
+            lines = FileHandler.iterate_data_from_file(filename=self._data_file, use_mmap=self._use_mmap)
+        for entry in TrafficLogParser.iterate_data_entries(lines=lines):
+            yield [int(value) for value in entry]
+
+    def _create_bucket_writer(self, filename):
+        return LogSplitterBucketWriter(filename=filename, accumulator=self._create_accumulator(),
+                                       buffer_size=self._buffer_size, accumulators=self._accumulators)
+
+    def _create_accumulator(self):
+        if not self._print_avg_and_max:
+            return None
+        return LogSplitterDataAccumulator(first_column_avg=self._first_column_avg,
+                                          last_column_avg=self._last_column_avg,
+                                          first_column_max=self._first_column_max,
+                                          last_column_max=self._last_column_max, percentiles=self._percentiles)
+
+    @staticmethod
+    def get_interval_directory_name(time_interval_in_seconds):
         if time_interval_in_seconds == 300:
             time_in = "5min"
         elif time_interval_in_seconds == 1800:
@@ -69,78 +170,296 @@ class LogSplitter:
             time_in = "year"
         else:
             time_in = str(time_interval_in_seconds) + "sec"
-        file_name = self._file_path + "/t_" + str(time_in) + "/log_" + str(time_in) + "_" + str(file_number) + ".csv"
-        return file_name
+        return "t_" + time_in
 
-    def _create_split_log(self, data, filename):
-        if self._print_avg_and_max:
-            data = LogSplitterDataCalculator.calculate_total_average(data=data, first_column=self._first_column_avg,
-                                                                     last_column=self._last_column_avg)
-            data = LogSplitterDataCalculator.calculate_max_value(data=data, first_column=self._first_column_max,
-                                                                 last_column=self._last_column_max)
-        FileWriter.write_data_to_file(data=data, filename=filename)
+    def _get_file_name(self, time_interval_in_seconds, file_number):
+        directory_name = LogSplitter.get_interval_directory_name(time_interval_in_seconds=time_interval_in_seconds)
+        file_name = self._file_path + "/" + directory_name + "/log" + directory_name[1:] + "_" + str(file_number)
+        file_name += self._file_extension
+        return file_name
 
-    def _split_log_by_date(self, start_date, end_date):
+    def _get_date_file_name(self, start_date, end_date):
         file_name = self._file_path + "/log"
         if start_date is not None:
             file_name += "_from_" + str(start_date)
         if end_date is not None:
             file_name += "_to_" + str(end_date)
-        file_name += ".csv"
-        split_file = list()
-        for idx, line in enumerate(self._data):
-            if start_date is not None:
-                if int(line[0]) < int(start_date):
+        file_name += self._file_extension
+        return file_name
+
+    def _create_split_log(self, data, filename):
+        summary_entries = list()
+        accumulator = self._create_accumulator()
+        if accumulator is not None:
+            accumulator.add_entries(entries=data)
+            summary_entries = accumulator.get_summary_entries()
+            self._accumulators.append((filename, accumulator))
+        summary = [[DataHandler.convert_to_string(value=value) for value in entry] for entry in summary_entries]
+        with Instrumentation.measure_file(filename=filename):
+            if self._write_files and not self._binary:
+                FileWriter.write_data_to_file(data=itertools.chain(data, summary_entries), filename=filename)
+            elif self._write_files:
+                split_log = TrafficLogParser.parse_rows(rows=data)
+                binary_log = BinaryLog(timestamps=split_log.timestamps, columns=split_log.columns, summary=summary,
+                                       time_interval_sec=BinaryLog.get_time_interval(timestamps=self._data.timestamps),
+                                       node_name=self._file_path.rsplit(sep="/", maxsplit=1)[-1])
+                FileHandler.write_binary_log_to_file(binary_log=binary_log, filename=filename)
+        if self._keep_split_logs:
+            summary = [[DataHandler.convert_to_number(value=value) for value in entry] for entry in summary]
+            split_log = TrafficLogParser.parse_rows(rows=data, summary=summary)
+            self._split_logs.append((filename, split_log))
+
+    def _split_log_by_date(self, start_date, end_date):
+        file_name = self._get_date_file_name(start_date=start_date, end_date=end_date)
+        start_index = 0
+        end_index = len(self._data)
+        if start_date is not None:
+            start_index = self._data.find_date(date=int(start_date))
+        if end_date is not None:
+            end_index = self._data.find_date(date=int(end_date), start=start_index)
+        split_file = [line for line in self._data.rows(start=start_index, end=end_index)
+                      if start_date is None or line[0] >= int(start_date)]
+        self._create_split_log(data=split_file, filename=file_name)
+
+    def _split_log_by_date_streaming(self, start_date, end_date):
+        writer = self._create_bucket_writer(filename=self._get_date_file_name(start_date=start_date,
+                                                                              end_date=end_date))
+        try:
+            for entry in self._get_data_entries(start_date=start_date):
+                if start_date is not None and entry[0] < int(start_date):
                     continue
-            if end_date is not None:
-                if int(line[0]) >= int(end_date):
+                if end_date is not None and entry[0] >= int(end_date):
                     break
-                split_file.append(line)
-            else:
-                split_file.append(line)
-        self._create_split_log(data=split_file, filename=file_name)
+                writer.write(entry=entry)
+        except BaseException:
+            writer.discard()
+            raise
+        writer.finalize()
 
 
-class LogSplitterDataCalculator:
+class LogSplitterWriterPool:
 
-    @staticmethod
-    def calculate_total_average(data, first_column, last_column):
-        total_bits = [0] * (last_column - first_column + 1)
-        total_time = 0
-        for idx, line in enumerate(data):
+    def __init__(self, create_writer, max_open_files):
+        self._create_writer = create_writer
+        self._max_open_files = max(max_open_files, 1)
+        self._writers = dict()
+        self._first_window = 0
+        self._last_window = 0
+
+    @property
+    def last_window(self):
+        return self._last_window
+
+    def write(self, window, entry):
+        window = max(window, self._first_window)
+        if window > self._last_window:
+            self._last_window = window
+            self.finalize_until(window=window - self._max_open_files)
+        writer = self._writers.get(window)
+        if writer is None:
+            writer = self._create_writer(window)
+            self._writers[window] = writer
+        writer.write(entry=entry)
+
+    def finalize_until(self, window):
+        for idx in range(self._first_window, window + 1):
+            writer = self._writers.pop(idx, None)
+            if writer is None:
+                writer = self._create_writer(idx)
+            writer.finalize()
+        self._first_window = max(self._first_window, window + 1)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.discard()
+        self._writers.clear()
+
+
+class LogSplitterBucketWriter:
+
+    def __init__(self, filename, accumulator, buffer_size, accumulators=None):
+        self._filename = filename
+        self._accumulator = accumulator
+        self._accumulators = accumulators
+        self._writer = FileWriter(filename=filename, buffer_size=buffer_size)
+
+    def write(self, entry):
+        if self._accumulator is not None:
+            self._accumulator.add(entry=entry)
+        self._writer.write(entry=entry)
+
+    def finalize(self):
+        if self._accumulator is not None:
             try:
-                time_difference = line[0] - data[idx - 1][0]
-                if time_difference < 0:
-                    time_difference = 0
+                summary_entries = self._accumulator.get_summary_entries()
+            except ZeroDivisionError:
+                self.discard()
+                raise
+            self._writer.write_entries(entries=summary_entries)
+        self._writer.commit()
+        if self._accumulator is not None and self._accumulators is not None:
+            self._accumulators.append((self._filename, self._accumulator))
+
+    def discard(self):
+        self._writer.discard()
+
+
+class LogSplitterDataAccumulator:
+
+    def __init__(self, first_column_avg, last_column_avg, first_column_max, last_column_max, percentiles=tuple(),
+                 relative_accuracy=None):
+        self._first_column_avg = first_column_avg
+        self._last_column_avg = last_column_avg
+        self._first_column_max = first_column_max
+        self._last_column_max = last_column_max
+        self._percentiles = tuple(percentiles)
+        self._total_bits = [0] * (last_column_avg - first_column_avg + 1)
+        self._total_time = 0
+        self._max_values = [0] * (last_column_max - first_column_max + 1)
+        self._sketches = [LogSplitterQuantileSketch(relative_accuracy=relative_accuracy)
+                          for _ in self._total_bits] if len(self._percentiles) > 0 else list()
+        self._first_entry = None
+        self._last_date = None
+
+    @property
+    def sketches(self):
+        return self._sketches
+
+    def add(self, entry):
+        self.add_entries(entries=(entry,))
+
+    def add_entries(self, entries):
+        first_column_avg, last_column_avg = self._first_column_avg - 1, self._last_column_avg
+        first_column_max, last_column_max = self._first_column_max - 1, self._last_column_max
+        total_bits = self._total_bits
+        max_values = self._max_values
+        sketches = self._sketches
+        total_time = self._total_time
+        last_date = self._last_date
+        for entry in entries:
+            if self._first_entry is None:
+                self._first_entry = entry
+            elif entry[0] > last_date:
+                time_difference = entry[0] - last_date
                 total_time += time_difference
-                for cidx, column in enumerate(line[first_column - 1:last_column]):
-                    total_bits[cidx] += line[cidx + first_column - 1] * time_difference
-            except TypeError:
-                continue
+                for idx, value in enumerate(entry[first_column_avg:last_column_avg]):
+                    total_bits[idx] += value * time_difference
+            last_date = entry[0]
+            for idx, value in enumerate(entry[first_column_max:last_column_max]):
+                if value > max_values[idx]:
+                    max_values[idx] = value
+            if sketches:
+                for sketch, value in zip(sketches, entry[first_column_avg:last_column_avg]):
+                    sketch.add(value=value)
+        self._total_time = total_time
+        self._last_date = last_date
+
+    def _add_time_weighted_values(self, total_bits, entry, time_difference):
+        if time_difference < 0:
+            time_difference = 0
+        for idx, value in enumerate(entry[self._first_column_avg - 1:self._last_column_avg]):
+            total_bits[idx] += value * time_difference
+
+    def merge(self, accumulator):
+        if (accumulator._first_column_avg, accumulator._last_column_avg, accumulator._first_column_max,
+                accumulator._last_column_max, accumulator._percentiles) != \
+                (self._first_column_avg, self._last_column_avg, self._first_column_max, self._last_column_max,
+                 self._percentiles):
+            raise LogSplitter.LogSplitterError("only accumulators of the same columns and percentiles can be merged")
+        if accumulator._first_entry is None:
+            return self
+        if self._first_entry is None:
+            self._first_entry = accumulator._first_entry
+        else:
+            self._add_time_weighted_values(total_bits=self._total_bits, entry=accumulator._first_entry,
+                                           time_difference=accumulator._first_entry[0] - self._last_date)
+            self._total_time += max(accumulator._first_entry[0] - self._last_date, 0)
+        for idx, total_bits in enumerate(accumulator._total_bits):
+            self._total_bits[idx] += total_bits
+        self._total_time += accumulator._total_time
+        self._last_date = accumulator._last_date
+        for idx, value in enumerate(accumulator._max_values):
+            if value > self._max_values[idx]:
+                self._max_values[idx] = value
+        for sketch, other_sketch in zip(self._sketches, accumulator._sketches):
+            sketch.merge(sketch=other_sketch)
+        return self
+
+    def get_summary_entries(self):
+        total_bits = list(self._total_bits)
+        total_time = self._total_time
+        if self._first_entry is not None:
+            self._add_time_weighted_values(total_bits=total_bits, entry=self._first_entry,
+                                           time_difference=self._first_entry[0] - self._last_date)
+            total_time += max(self._first_entry[0] - self._last_date, 0)
         average_bits = [column / total_time for column in total_bits]
-        last_entry = ["Average (bit/s)"] + average_bits
-        data_with_averages = [line for line in data + [last_entry]]
         average_bits_in_kilobytes = [column / 1024 * 8 for column in average_bits]
-        last_entry = ["Average (kB/s)"] + average_bits_in_kilobytes
-        data_with_averages = [line for line in data_with_averages + [last_entry]]
-        return data_with_averages
+        max_values_in_kilobytes = [value / 1024 * 8 for value in self._max_values]
+        summary_entries = list()
+        for percentile in self._percentiles:
+            percentile_bits = [sketch.get_quantile(quantile=percentile / 100) for sketch in self._sketches]
+            summary_entries.append(["{:g}th percentile (bit/s)".format(percentile)] + percentile_bits)
+            summary_entries.append(["{:g}th percentile (kB/s)".format(percentile)]
+                                   + [value / 1024 * 8 for value in percentile_bits])
+        return summary_entries + [["Average (bit/s)"] + average_bits, ["Average (kB/s)"] + average_bits_in_kilobytes,
+                                  ["Maximum (bit/s)"] + self._max_values, ["Maximum (kB/s)"] + max_values_in_kilobytes]
 
-    @staticmethod
-    def calculate_max_value(data, first_column, last_column):
-        max_values = [0] * (last_column - first_column + 1)
-        for line in data:
-            try:
-                for idx, column in enumerate(line[first_column - 1:last_column]):
-                    if line[idx + first_column - 1] > max_values[idx]:
-                        max_values[idx] = line[idx + first_column - 1]
-            except TypeError:
-                continue
-        last_entry = ["Maximum (bit/s)"] + max_values
-        data_with_maximums = [line for line in data + [last_entry]]
-        max_values_in_kilobytes = [value / 1024 * 8 for value in max_values]
-        last_entry = ["Maximum (kB/s)"] + max_values_in_kilobytes
-        data_with_maximums = [line for line in data_with_maximums + [last_entry]]
-        return data_with_maximums
+
+class LogSplitterQuantileSketch:
+
+    default_relative_accuracy = 0.01
+
+    def __init__(self, relative_accuracy=None):
+        if relative_accuracy is None:
+            relative_accuracy = LogSplitterQuantileSketch.default_relative_accuracy
+        if not 0 < relative_accuracy < 1:
+            raise LogSplitter.LogSplitterError("relative accuracy must be between 0 and 1, got: {}"
+                                               .format(relative_accuracy))
+        self._relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets = dict()
+        self._zero_count = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def relative_accuracy(self):
+        return self._relative_accuracy
+
+    def add(self, value, count=1):
+        if value > 0:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self._buckets[key] = self._buckets.get(key, 0) + count
+        else:
+            self._zero_count += count
+        self._count += count
+
+    def merge(self, sketch):
+        if sketch._relative_accuracy != self._relative_accuracy:
+            raise LogSplitter.LogSplitterError("only sketches of the same relative accuracy can be merged")
+        for key, count in sketch._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + count
+        self._zero_count += sketch._zero_count
+        self._count += sketch._count
+        return self
+
+    def get_quantile(self, quantile):
+        if self._count == 0:
+            raise LogSplitter.LogSplitterError("no values to calculate quantile of")
+        if not 0 <= quantile <= 1:
+            raise LogSplitter.LogSplitterError("quantile must be between 0 and 1, got: {}".format(quantile))
+        rank = quantile * (self._count - 1)
+        count = self._zero_count
+        if count > rank:
+            return 0
+        for key in sorted(self._buckets):
+            count += self._buckets[key]
+            if count > rank:
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._buckets) / (self._gamma + 1)
 
 
 class LogSplitterDateConverter:
@@ -0,0 +1,131 @@
+import json
+import os
+import struct
+import sys
+from array import array
+
+from app.file_handler import FileWriter
+from app.traffic_log import TrafficLog, TrafficLogParser
+
+
+class ParsedDataCache:
+
+    class ParsedDataCacheError(Exception):
+        pass
+
+    EXTENSION = ".tlc"
+    _MAGIC = b"TLPC"
+    _VERSION = 1
+    _HEADER = struct.Struct("<4sIIqqII")
+    _LOG_HEADER = struct.Struct("<QII")
+
+    def __init__(self, max_size=64 * 1024 * 1024):
+        if max_size < 0:
+            raise ParsedDataCache.ParsedDataCacheError("cache size can't be negative")
+        self._max_size = max_size
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @staticmethod
+    def get_cache_file_name(filename):
+        return filename + ParsedDataCache.EXTENSION
+
+    def get_traffic_logs(self, filename, parse):
+        traffic_logs = self._load(filename=filename)
+        if traffic_logs is None:
+            traffic_logs = tuple(parse(filename))
+            self._save(filename=filename, traffic_logs=traffic_logs)
+            self._evict(directory=os.path.dirname(os.path.abspath(filename)))
+        return traffic_logs
+
+    @staticmethod
+    def _get_file_key(filename):
+        stat = os.stat(filename)
+        return os.path.abspath(filename).encode(), stat.st_size, stat.st_mtime_ns
+
+    def _load(self, filename):
+        cache_file_name = ParsedDataCache.get_cache_file_name(filename=filename)
+        try:
+            path, size, mtime_ns = ParsedDataCache._get_file_key(filename=filename)
+            with open(cache_file_name, "rb") as file:
+                header = ParsedDataCache._HEADER.unpack(file.read(ParsedDataCache._HEADER.size))
+                magic, version, parser_version, cached_size, cached_mtime_ns, path_length, number_of_logs = header
+                if magic != ParsedDataCache._MAGIC or version != ParsedDataCache._VERSION:
+                    return None
+                if parser_version != TrafficLogParser.VERSION or (cached_size, cached_mtime_ns) != (size, mtime_ns):
+                    return None
+                if file.read(path_length) != path:
+                    return None
+                traffic_logs = tuple(ParsedDataCache._read_traffic_log(file=file) for _ in range(number_of_logs))
+            os.utime(cache_file_name)
+        except (OSError, EOFError, ValueError, struct.error):
+            return None
+        return traffic_logs
+
+    @staticmethod
+    def _read_traffic_log(file):
+        number_of_rows, number_of_columns, metadata_length = ParsedDataCache._LOG_HEADER.unpack(
+            file.read(ParsedDataCache._LOG_HEADER.size))
+        typecodes = file.read(number_of_columns).decode()
+        metadata = json.loads(file.read(metadata_length).decode())
+        timestamps = ParsedDataCache._read_array(file=file, typecode="q", length=number_of_rows)
+        columns = [ParsedDataCache._read_array(file=file, typecode=typecode, length=number_of_rows)
+                   for typecode in typecodes]
+        return TrafficLog(timestamps=timestamps, columns=columns, header=metadata["header"],
+                          summary=metadata["summary"])
+
+    @staticmethod
+    def _read_array(file, typecode, length):
+        values = array(typecode)
+        values.fromfile(file, length)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    def _save(self, filename, traffic_logs):
+        cache_file_name = ParsedDataCache.get_cache_file_name(filename=filename)
+        try:
+            path, size, mtime_ns = ParsedDataCache._get_file_key(filename=filename)
+            with FileWriter(filename=cache_file_name) as writer:
+                writer.write_bytes(data=ParsedDataCache._HEADER.pack(ParsedDataCache._MAGIC, ParsedDataCache._VERSION,
+                                                                     TrafficLogParser.VERSION, size, mtime_ns,
+                                                                     len(path), len(traffic_logs)) + path)
+                for traffic_log in traffic_logs:
+                    ParsedDataCache._write_traffic_log(writer=writer, traffic_log=traffic_log)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _write_traffic_log(writer, traffic_log):
+        metadata = json.dumps({"header": traffic_log.header, "summary": traffic_log.summary}).encode()
+        typecodes = "".join(column.typecode for column in traffic_log.columns).encode()
+        writer.write_bytes(data=ParsedDataCache._LOG_HEADER.pack(len(traffic_log), len(traffic_log.columns),
+                                                                 len(metadata)) + typecodes + metadata,
+                           lines_written=len(traffic_log))
+        for values in [traffic_log.timestamps] + list(traffic_log.columns):
+            ParsedDataCache._write_array(writer=writer, values=values)
+
+    @staticmethod
+    def _write_array(writer, values):
+        if sys.byteorder != "little":
+            values = array(values.typecode, values)
+            values.byteswap()
+        writer.write_bytes(data=values)
+
+    def _evict(self, directory):
+        try:
+            cache_files = list()
+            for file in os.listdir(directory):
+                if file.endswith(ParsedDataCache.EXTENSION):
+                    stat = os.stat(os.path.join(directory, file))
+                    cache_files.append((stat.st_mtime_ns, stat.st_size, os.path.join(directory, file)))
+            total_size = sum(size for _, size, _ in cache_files)
+            for _, size, cache_file_name in sorted(cache_files):
+                if total_size <= self._max_size:
+                    break
+                os.remove(cache_file_name)
+                total_size -= size
+        except OSError:
+            pass
@@ -0,0 +1,172 @@
+import heapq
+import os
+import shutil
+import tempfile
+
+from app.data_handler import DataHandler
+from app.file_handler import FileHandler, FileWriter
+from app.instrumentation import Instrumentation
+
+
+class RawLogMerger:
+
+    class RawLogMergerError(Exception):
+        pass
+
+    ENTRY_OVERHEAD = 120
+    memory_budget = 64 * 1024 * 1024
+    max_open_chunks = 64
+    chunk_buffer_size = 65536
+
+    def __init__(self, memory_budget=None, chunk_directory=None, deduplicate=True):
+        self._memory_budget = memory_budget if memory_budget is not None else RawLogMerger.memory_budget
+        if self._memory_budget <= 0:
+            raise RawLogMerger.RawLogMergerError("memory budget must be positive, got: {}".format(memory_budget))
+        self._chunk_directory = chunk_directory
+        self._deduplicate = deduplicate
+        self._header = list()
+        self._number_of_chunks = 0
+        self._number_of_entries = 0
+        self._number_of_duplicates = 0
+
+    @property
+    def header(self):
+        return self._header
+
+    @property
+    def number_of_chunks(self):
+        return self._number_of_chunks
+
+    @property
+    def number_of_entries(self):
+        return self._number_of_entries
+
+    @property
+    def number_of_duplicates(self):
+        return self._number_of_duplicates
+
+    def merge(self, filenames):
+        if len(filenames) == 0:
+            raise RawLogMerger.RawLogMergerError("no raw logs to merge")
+        for filename in filenames:
+            if not os.path.isfile(filename):
+                raise RawLogMerger.RawLogMergerError("file: {} does not exist".format(filename))
+        self._header = list()
+        self._number_of_chunks = 0
+        self._number_of_entries = 0
+        self._number_of_duplicates = 0
+        directory = tempfile.mkdtemp(prefix="raw_log_merge_", dir=self._chunk_directory)
+        try:
+            with Instrumentation.measure_stage("merge", files=list(filenames), memory_budget=self._memory_budget):
+                chunks, entries = self._create_sorted_chunks(filenames=filenames, directory=directory)
+                chunks = self._reduce_chunks(chunks=chunks, directory=directory)
+            yield from self._header
+            if len(chunks) == 0:
+                sorted_entries = entries
+            else:
+                sorted_entries = RawLogMerger._merge_chunks(chunks=chunks + [entries])
+            yield from self._deduplicate_entries(entries=sorted_entries)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def merge_to_file(self, filenames, filename):
+        with FileWriter(filename=filename) as writer:
+            writer.write_entries(entries=self.merge(filenames=filenames))
+        return filename
+
+    def _create_sorted_chunks(self, filenames, directory):
+        chunks = list()
+        entries = list()
+        chunk_size = 0
+        for filename in filenames:
+            is_leading_line = True
+            for line in FileHandler.iterate_data_from_file(filename=filename):
+                if RawLogMerger.get_entry_date(entry=line) is None:
+                    if is_leading_line and filename == filenames[0]:
+                        self._header.append(line)
+                    continue
+                is_leading_line = False
+                entries.append(line)
+                chunk_size += len(line) + RawLogMerger.ENTRY_OVERHEAD
+                if chunk_size >= self._memory_budget:
+                    chunks.append(self._write_chunk(entries=entries, directory=directory))
+                    entries = list()
+                    chunk_size = 0
+        self._number_of_entries = sum(len(chunk) for chunk in chunks) + len(entries)
+        entries.sort(key=RawLogMerger.get_entry_date)
+        return chunks, entries
+
+    def _write_chunk(self, entries, directory):
+        entries.sort(key=RawLogMerger.get_entry_date)
+        chunk = RawLogMergerChunk(filename=os.path.join(directory, "chunk_{}.csv".format(self._number_of_chunks)),
+                                  number_of_entries=len(entries))
+        self._number_of_chunks += 1
+        chunk.write(entries=entries)
+        return chunk
+
+    def _reduce_chunks(self, chunks, directory):
+        while len(chunks) > RawLogMerger.max_open_chunks:
+            reduced_chunks = list()
+            for start in range(0, len(chunks), RawLogMerger.max_open_chunks):
+                group = chunks[start:start + RawLogMerger.max_open_chunks]
+                if len(group) == 1:
+                    reduced_chunks.append(group[0])
+                    continue
+                chunk = RawLogMergerChunk(filename=os.path.join(directory, "chunk_{}.csv".format(
+                    self._number_of_chunks)), number_of_entries=sum(len(merged_chunk) for merged_chunk in group))
+                self._number_of_chunks += 1
+                chunk.write(entries=RawLogMerger._merge_chunks(chunks=group))
+                for merged_chunk in group:
+                    merged_chunk.remove()
+                reduced_chunks.append(chunk)
+            chunks = reduced_chunks
+        return chunks
+
+    @staticmethod
+    def _merge_chunks(chunks):
+        return heapq.merge(*chunks, key=RawLogMerger.get_entry_date)
+
+    def _deduplicate_entries(self, entries):
+        last_date = None
+        for entry in entries:
+            date = RawLogMerger.get_entry_date(entry=entry)
+            if self._deduplicate and date == last_date:
+                self._number_of_duplicates += 1
+                continue
+            last_date = date
+            yield entry
+
+    @staticmethod
+    def get_entry_date(entry):
+        date = entry.split(";", 1)[0]
+        try:
+            return int(date)
+        except ValueError:
+            date = DataHandler.convert_to_number(value=date)
+        if not isinstance(date, int):
+            return None
+        return date
+
+
+class RawLogMergerChunk:
+
+    def __init__(self, filename, number_of_entries):
+        self._filename = filename
+        self._number_of_entries = number_of_entries
+
+    def __len__(self):
+        return self._number_of_entries
+
+    def __iter__(self):
+        with open(self._filename, "r", buffering=RawLogMerger.chunk_buffer_size, newline="") as file:
+            for line in file:
+                yield line[:-1]
+
+    def write(self, entries):
+        with open(self._filename, "w", buffering=RawLogMerger.chunk_buffer_size, newline="") as file:
+            for entry in entries:
+                file.write(entry)
+                file.write("\n")
+
+    def remove(self):
+        os.remove(self._filename)
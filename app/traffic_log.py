@@ -0,0 +1,287 @@
+import bisect
+from array import array
+
+from app.binary_log import BinaryLog
+from app.data_handler import DataHandler
+from app.file_handler import FileHandler
+from app.instrumentation import Instrumentation
+
+
+class TrafficLog:
+
+    class TrafficLogError(Exception):
+        pass
+
+    def __init__(self, timestamps=None, columns=None, header=None, summary=None):
+        self._timestamps = timestamps if timestamps is not None else array("q")
+        self._columns = columns if columns is not None else list()
+        self._header = header if header is not None else list()
+        self._summary = summary if summary is not None else list()
+        self._is_sorted = None
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    @property
+    def timestamps(self):
+        return self._timestamps
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @property
+    def header(self):
+        return self._header
+
+    @property
+    def summary(self):
+        return self._summary
+
+    @property
+    def number_of_columns(self):
+        return len(self._columns) + 1
+
+    def get_row(self, idx):
+        return [self._timestamps[idx]] + [column[idx] for column in self._columns]
+
+    def rows(self, start=0, end=None):
+        if end is None:
+            end = len(self._timestamps)
+        for idx in range(start, end):
+            yield self.get_row(idx=idx)
+
+    def is_sorted(self):
+        if self._is_sorted is None:
+            timestamps = self._timestamps
+            self._is_sorted = all(timestamps[idx] <= timestamps[idx + 1] for idx in range(len(timestamps) - 1))
+        return self._is_sorted
+
+    def find_date(self, date, start=0):
+        if self.is_sorted():
+            return bisect.bisect_left(self._timestamps, date, start)
+        for idx in range(start, len(self._timestamps)):
+            if self._timestamps[idx] >= date:
+                return idx
+        return len(self._timestamps)
+
+    def slice(self, start, end):
+        columns = [column[start:end] for column in self._columns]
+        return TrafficLog(timestamps=self._timestamps[start:end], columns=columns)
+
+    def as_integers(self):
+        columns = [column if column.typecode == "q" else array("q", [int(value) for value in column])
+                   for column in self._columns]
+        return TrafficLog(timestamps=self._timestamps, columns=columns, header=self._header, summary=self._summary)
+
+    def sorted_by_date(self):
+        order = sorted(range(len(self._timestamps)), key=self._timestamps.__getitem__)
+        timestamps = array("q", [self._timestamps[idx] for idx in order])
+        columns = [array(column.typecode, [column[idx] for idx in order]) for column in self._columns]
+        return TrafficLog(timestamps=timestamps, columns=columns, header=self._header, summary=self._summary)
+
+    @staticmethod
+    def concatenate(traffic_logs):
+        traffic_logs = [traffic_log for traffic_log in traffic_logs if len(traffic_log) > 0]
+        if len(traffic_logs) == 0:
+            return TrafficLog()
+        number_of_columns = traffic_logs[0].number_of_columns
+        for traffic_log in traffic_logs:
+            if traffic_log.number_of_columns != number_of_columns:
+                raise TrafficLog.TrafficLogError("can't concatenate logs with different number of columns")
+        timestamps = array("q")
+        for traffic_log in traffic_logs:
+            timestamps.extend(traffic_log.timestamps)
+        columns = list()
+        for column_idx in range(number_of_columns - 1):
+            typecodes = {traffic_log.columns[column_idx].typecode for traffic_log in traffic_logs}
+            column = array("q" if typecodes == {"q"} else "d")
+            for traffic_log in traffic_logs:
+                values = traffic_log.columns[column_idx]
+                column.extend(values if values.typecode == column.typecode else array(column.typecode, values))
+            columns.append(column)
+        return TrafficLog(timestamps=timestamps, columns=columns)
+
+
+class TrafficLogParser:
+
+    VERSION = 1
+    _FLOATS = ("nan", "inf", "infinity")
+
+    @staticmethod
+    def parse_file(filename, use_mmap=False):
+        if BinaryLog.is_binary_log(filename=filename):
+            try:
+                traffic_log = TrafficLogParser.parse_binary_log(binary_log=BinaryLog.read(filename=filename))
+            except BinaryLog.BinaryLogError as e:
+                raise TrafficLog.TrafficLogError(str(e))
+            Instrumentation.add_file_read(filename=filename, rows_read=len(traffic_log))
+            return traffic_log
+        return TrafficLogParser.parse_lines(lines=FileHandler.iterate_data_from_file(filename=filename,
+                                                                                     use_mmap=use_mmap))
+
+    @staticmethod
+    def parse_lines(lines, raw_metadata=False):
+        lines = lines if isinstance(lines, list) else list(lines)
+        data_start = 0
+        while data_start < len(lines) and not TrafficLogParser._is_data_entry(fields=lines[data_start].split(";")):
+            data_start += 1
+        data_end = len(lines)
+        while data_end > data_start and not TrafficLogParser._is_data_entry(fields=lines[data_end - 1].split(";")):
+            data_end -= 1
+        try:
+            timestamps, columns = TrafficLogParser._convert_columns(lines=lines[data_start:data_end])
+        except (ValueError, OverflowError):
+            return TrafficLogParser._parse_entries(entries=(line.split(";") for line in lines),
+                                                   raw_metadata=raw_metadata)
+        header = TrafficLogParser._convert_metadata(entries=[line.split(";") for line in lines[:data_start]],
+                                                    raw_metadata=raw_metadata)
+        summary = TrafficLogParser._convert_metadata(entries=[line.split(";") for line in lines[data_end:]],
+                                                     raw_metadata=raw_metadata)
+        return TrafficLog(timestamps=timestamps, columns=columns, header=header, summary=summary)
+
+    @staticmethod
+    def _is_data_entry(fields):
+        first_character = fields[0][:1]
+        if first_character.isdigit():
+            return True
+        if not first_character or first_character.isalpha() and fields[0].lower() not in TrafficLogParser._FLOATS:
+            return False
+        return TrafficLogParser._convert_data_entry(fields=fields) is not None
+
+    @staticmethod
+    def _convert_columns(lines):
+        if len(lines) == 0:
+            return array("q"), None
+        number_of_separators = lines[0].count(";")
+        if any(line.count(";") != number_of_separators for line in lines):
+            raise ValueError("incorrect number of data columns")
+        fields = ";".join(lines).split(";")
+        timestamps = TrafficLogParser._convert_column(values=fields[::number_of_separators + 1])
+        if timestamps.typecode != "q":
+            timestamps = array("q", map(int, timestamps))
+        return timestamps, [TrafficLogParser._convert_column(values=fields[column_idx::number_of_separators + 1])
+                            for column_idx in range(1, number_of_separators + 1)]
+
+    @staticmethod
+    def _convert_column(values):
+        try:
+            return array("q", map(int, values))
+        except (ValueError, OverflowError):
+            return array("d", map(float, values))
+
+    @staticmethod
+    def _convert_metadata(entries, raw_metadata):
+        if raw_metadata:
+            return entries
+        return [[value if value[:1].isalpha() and value.lower() not in TrafficLogParser._FLOATS
+                 else DataHandler.convert_to_number(value=value) for value in fields] for fields in entries]
+
+    @staticmethod
+    def _parse_entries(entries, raw_metadata):
+        timestamps = array("q")
+        columns = None
+        header = list()
+        summary = list()
+        for line_idx, fields in enumerate(entries):
+            values = TrafficLogParser._convert_data_entry(fields=fields)
+            if values is None:
+                entry = fields if raw_metadata else [DataHandler.convert_to_number(value=value) for value in fields]
+                if len(timestamps) == 0:
+                    header.append(entry)
+                else:
+                    summary.append(entry)
+                continue
+            if len(summary) > 0:
+                raise TrafficLog.TrafficLogError("data entry found after summary entries at line: {}"
+                                                 .format(line_idx))
+            if columns is None:
+                columns = [array("q") for _ in values[1:]]
+            elif len(values) != len(columns) + 1:
+                raise TrafficLog.TrafficLogError("incorrect number of data columns at line: {}".format(line_idx))
+            timestamps.append(int(values[0]))
+            for column_idx, value in enumerate(values[1:]):
+                TrafficLogParser._append_value(columns=columns, column_idx=column_idx, value=value)
+        return TrafficLog(timestamps=timestamps, columns=columns, header=header, summary=summary)
+
+    @staticmethod
+    def parse_binary_log(binary_log):
+        header = [[DataHandler.convert_to_number(value=value) for value in entry] for entry in binary_log.header]
+        summary = [[DataHandler.convert_to_number(value=value) for value in entry] for entry in binary_log.summary]
+        return TrafficLog(timestamps=binary_log.timestamps, columns=list(binary_log.columns), header=header,
+                          summary=summary)
+
+    @staticmethod
+    def parse_rows(rows, header=None, summary=None):
+        timestamps = array("q")
+        columns = None
+        for row_idx, row in enumerate(rows):
+            if columns is None:
+                columns = [array("q") for _ in row[1:]]
+            elif len(row) != len(columns) + 1:
+                raise TrafficLog.TrafficLogError("incorrect number of data columns at row: {}".format(row_idx))
+            timestamps.append(int(row[0]))
+            for column_idx, value in enumerate(row[1:]):
+                TrafficLogParser._append_value(columns=columns, column_idx=column_idx, value=value)
+        return TrafficLog(timestamps=timestamps, columns=columns, header=header, summary=summary)
+
+    @staticmethod
+    def iterate_data_entries(lines):
+        converters = list()
+        integers = False
+        for line in lines:
+            fields = line.split(";")
+            if len(fields) == len(converters) and fields[0][:1].isdigit():
+                try:
+                    if integers:
+                        values = list(map(int, fields))
+                    else:
+                        values = [convert(field) for convert, field in zip(converters, fields)]
+                        values[0] = int(values[0])
+                except ValueError:
+                    values = None
+                if values is not None:
+                    yield values
+                    continue
+            if not TrafficLogParser._is_data_entry(fields=fields):
+                continue
+            values = TrafficLogParser._convert_data_entry(fields=fields)
+            if values is None:
+                continue
+            converters = TrafficLogParser._get_converters(values=values, converters=converters)
+            integers = float not in converters
+            values[0] = int(values[0])
+            yield values
+
+    @staticmethod
+    def _get_converters(values, converters):
+        if len(converters) != len(values):
+            converters = [int] * len(values)
+        return [float if isinstance(value, float) or convert is float else int
+                for convert, value in zip(converters, values)]
+
+    @staticmethod
+    def _convert_data_entry(fields):
+        values = list()
+        for field in fields:
+            try:
+                values.append(int(field))
+            except ValueError:
+                try:
+                    values.append(float(field))
+                except ValueError:
+                    return None
+        return values
+
+    @staticmethod
+    def _append_value(columns, column_idx, value):
+        column = columns[column_idx]
+        if column.typecode == "q" and isinstance(value, float):
+            column = array("d", column)
+            columns[column_idx] = column
+        try:
+            column.append(value)
+        except OverflowError:
+            column = array("d", column)
+            column.append(value)
+            columns[column_idx] = column
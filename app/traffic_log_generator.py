@@ -0,0 +1,74 @@
+import random
+
+from app.file_handler import FileWriter
+
+
+class TrafficLogGenerator:
+
+    class TrafficLogGeneratorError(Exception):
+        pass
+
+    HEADER = "Date;Incoming (bit/s);Outgoing (bit/s);Maximum incoming (bit/s);Maximum outgoing (bit/s)"
+
+    def __init__(self, seed=0, time_interval_sec=300, jitter_sec=0, gap_probability=0.0, max_gap_intervals=12,
+                 delay_probability=0.0, burst_probability=0.0, burst_length=6, burst_factor=8.0, base_traffic=1000000,
+                 start_date=1451606400, header=True):
+        if time_interval_sec <= 0:
+            raise TrafficLogGenerator.TrafficLogGeneratorError("time interval must be positive")
+        if not 0 <= 2 * jitter_sec < time_interval_sec:
+            raise TrafficLogGenerator.TrafficLogGeneratorError("jitter must be smaller than half of time interval")
+        if not all(0 <= probability <= 1 for probability in (gap_probability, delay_probability, burst_probability)):
+            raise TrafficLogGenerator.TrafficLogGeneratorError("probabilities must be between 0 and 1")
+        self._seed = seed
+        self._time_interval_sec = time_interval_sec
+        self._jitter_sec = jitter_sec
+        self._gap_probability = gap_probability
+        self._max_gap_intervals = max(max_gap_intervals, 1)
+        self._delay_probability = delay_probability
+        self._burst_probability = burst_probability
+        self._burst_length = max(burst_length, 1)
+        self._burst_factor = burst_factor
+        self._base_traffic = base_traffic
+        self._start_date = start_date
+        self._header = header
+
+    def iterate_lines(self, number_of_rows, node_idx=0):
+        values_random = random.Random("{}:{}".format(self._seed, node_idx))
+        schedule_random = random.Random(self._seed)
+        if self._header:
+            yield TrafficLogGenerator.HEADER
+        date = self._start_date
+        burst_rows_left = 0
+        for _ in range(number_of_rows):
+            date += self._time_interval_sec
+            if schedule_random.random() < self._gap_probability:
+                date += schedule_random.randint(1, self._max_gap_intervals) * self._time_interval_sec
+            if self._delay_probability > 0 and schedule_random.random() < self._delay_probability:
+                date += schedule_random.randint(1, max(self._time_interval_sec - 1, 1))
+            if burst_rows_left > 0:
+                burst_rows_left -= 1
+            elif schedule_random.random() < self._burst_probability:
+                burst_rows_left = self._burst_length - 1
+            else:
+                burst_rows_left = -1
+            factor = self._burst_factor if burst_rows_left >= 0 else 1.0
+            jitter = values_random.randint(-self._jitter_sec, self._jitter_sec) if self._jitter_sec > 0 else 0
+            incoming = int(self._base_traffic * factor * (0.5 + values_random.random()))
+            outgoing = int(self._base_traffic * factor * (0.25 + values_random.random() / 2))
+            yield "{};{};{};{};{}".format(date + jitter, incoming, outgoing,
+                                          int(incoming * (1 + values_random.random())),
+                                          int(outgoing * (1 + values_random.random())))
+
+    def write_log(self, filename, number_of_rows, node_idx=0):
+        with FileWriter(filename=filename) as writer:
+            writer.write_entries(entries=self.iterate_lines(number_of_rows=number_of_rows, node_idx=node_idx))
+        return filename
+
+    def write_node_logs(self, directory, number_of_rows, number_of_nodes):
+        nodes = list()
+        for node_idx in range(number_of_nodes):
+            node_name = "node_{}".format(node_idx + 1)
+            filename = self.write_log(filename=directory + "/" + node_name + "_raw.csv", number_of_rows=number_of_rows,
+                                      node_idx=node_idx)
+            nodes.append((node_name, filename))
+        return nodes
@@ -0,0 +1,72 @@
+from app.coincidence_calculator import CoincidenceCalculator
+from app.impulse_calculator import ImpulseCalculator
+from app.log_organizer import LogOrganizer, LogOrganizerDataExporter
+from app.log_splitter import LogSplitter
+
+
+class TrafficPipeline:
+
+    def __init__(self, node_name, time_interval_sec, split_interval_sec, write_organized_log=False,
+                 write_split_logs=False, write_impulses=False):
+        self._node_name = node_name
+        self._time_interval_sec = time_interval_sec
+        self._split_interval_sec = split_interval_sec
+        self._write_organized_log = write_organized_log
+        self._write_split_logs = write_split_logs
+        self._write_impulses = write_impulses
+
+    @property
+    def node_name(self):
+        return self._node_name
+
+    @property
+    def organized_file_name(self):
+        return LogOrganizerDataExporter.get_file_name(node_name=self._node_name,
+                                                      time_interval_sec=self._time_interval_sec)
+
+    @property
+    def impulse_directory(self):
+        return "data/" + self._node_name + "/" + LogSplitter.get_interval_directory_name(
+            time_interval_in_seconds=self._split_interval_sec)
+
+    def run(self, filename):
+        organized_log = self.organize(filename=filename)
+        split_logs = self.split(organized_log=organized_log)
+        impulse_logs = self.calculate_impulses(split_logs=split_logs)
+        return self.get_node_impulse_data(impulse_logs=impulse_logs)
+
+    def organize(self, filename):
+        organizer = LogOrganizer()
+        return organizer.organize_log_to_traffic_log(filename=filename, node_name=self._node_name,
+                                                     time_interval_sec=self._time_interval_sec,
+                                                     export=self._write_organized_log)
+
+    def split(self, organized_log):
+        splitter = LogSplitter(data_file=self.organized_file_name, print_avg_and_max=True, first_column_avg=2,
+                               last_column_avg=3, first_column_max=4, last_column_max=5, traffic_log=organized_log,
+                               write_files=self._write_split_logs, keep_split_logs=True)
+        splitter.split_log(time_interval_in_seconds=self._split_interval_sec)
+        return splitter.split_logs
+
+    def calculate_impulses(self, split_logs):
+        calculator = ImpulseCalculator()
+        impulse_logs = list()
+        for filename, split_log in split_logs:
+            impulse_logs.append((filename, calculator.calculate_impulses_for_log(
+                traffic_log=split_log, filename=filename if self._write_impulses else None)))
+        if self._write_impulses and len(impulse_logs) > 0:
+            calculator.create_total_impulse_file(file_path=self.impulse_directory, impulse_logs=impulse_logs)
+        return impulse_logs
+
+    def get_node_impulse_data(self, impulse_logs):
+        if len(impulse_logs) == 0:
+            raise CoincidenceCalculator.CoincidenceCalculatorError("no impulse data for node: {}"
+                                                                   .format(self._node_name))
+        return self.impulse_directory, CoincidenceCalculator.get_node_impulse_data(
+            impulse_logs=[logs for _, logs in impulse_logs])
+
+    @staticmethod
+    def calculate_coincidences(node_a, node_b, time_interval, write_file=True):
+        calculator = CoincidenceCalculator()
+        return calculator.calculate_coincidences_for_impulse_data(node_a=node_a, node_b=node_b,
+                                                                  time_interval=time_interval, write_file=write_file)
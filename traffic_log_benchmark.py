@@ -0,0 +1,109 @@
+import argparse
+import sys
+
+from app.benchmark_suite import BenchmarkSuite
+from app.traffic_log_generator import TrafficLogGenerator
+
+_PROFILES = {"regular": {"jitter": 0.0, "gap_probability": 0.0, "delay_probability": 0.0},
+             "irregular": {"jitter": 0.1, "gap_probability": 0.01, "delay_probability": 0.2}}
+
+
+def traffic_log_benchmark(arguments):
+    parser = argparse.ArgumentParser(prog="traffic_log_benchmark.py",
+                                     description="Generate synthetic raw logs of increasing size, time every "
+                                                 "processing stage on them and save the results as JSON.")
+    parser.add_argument("-s", "--sizes", type=_parse_sizes, default=[10000, 100000],
+                        help="comma separated numbers of raw log rows, suffixes k and M are accepted "
+                             "(default: 10k,100k)")
+    parser.add_argument("-n", "--nodes", type=int, default=2, help="number of nodes to generate logs for")
+    parser.add_argument("--stages", type=_parse_stages, default=list(BenchmarkSuite.STAGES),
+                        help="comma separated stages to run: {}".format(",".join(BenchmarkSuite.STAGES)))
+    parser.add_argument("-i", "--interval", type=int, default=300, help="time interval of raw and organized logs")
+    parser.add_argument("--split-interval", type=int, default=86400, help="time interval to split logs by")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic log generator")
+    parser.add_argument("--profile", choices=sorted(_PROFILES), default="regular",
+                        help="shape of the raw logs: regular logs have an entry every interval, irregular logs add "
+                             "jitter, gaps and late entries, so organizing also averages entries (default: regular)")
+    parser.add_argument("--jitter", type=int,
+                        help="maximum deviation of raw entry dates in seconds, smaller than half of the interval "
+                             "(default: 0, irregular profile: a tenth of the interval)")
+    parser.add_argument("--gap-probability", type=float,
+                        help="probability of a gap of missing entries after each raw entry "
+                             "(default: 0, irregular profile: 0.01)")
+    parser.add_argument("--delay-probability", type=float,
+                        help="probability of a raw entry arriving up to one interval late "
+                             "(default: 0, irregular profile: 0.2)")
+    parser.add_argument("--burst-probability", type=float, default=0.01,
+                        help="probability of a traffic burst starting at each raw entry")
+    parser.add_argument("--burst-length", type=int, default=6, help="number of raw entries in a traffic burst")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="file to save JSON results to")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare timings with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="relative timing difference reported when comparing runs")
+    parser.add_argument("--super-linear-exponent", type=float, default=1.2,
+                        help="scaling exponent above which a stage is flagged as super-linear")
+    parser.add_argument("--directory", help="directory to create temporary benchmark data in")
+    args = parser.parse_args(arguments)
+    profile = _PROFILES[args.profile]
+    jitter_sec = args.jitter if args.jitter is not None else int(args.interval * profile["jitter"])
+    gap_probability = args.gap_probability if args.gap_probability is not None else profile["gap_probability"]
+    delay_probability = args.delay_probability if args.delay_probability is not None else profile["delay_probability"]
+    try:
+        generator = TrafficLogGenerator(seed=args.seed, time_interval_sec=args.interval, jitter_sec=jitter_sec,
+                                        gap_probability=gap_probability, delay_probability=delay_probability,
+                                        burst_probability=args.burst_probability, burst_length=args.burst_length)
+        suite = BenchmarkSuite(sizes=args.sizes, number_of_nodes=args.nodes, stages=args.stages,
+                               time_interval_sec=args.interval, split_interval_sec=args.split_interval,
+                               generator=generator, directory=args.directory,
+                               super_linear_exponent=args.super_linear_exponent)
+        baseline = BenchmarkSuite.load_results(filename=args.compare) if args.compare else None
+    except (TrafficLogGenerator.TrafficLogGeneratorError, BenchmarkSuite.BenchmarkSuiteError) as e:
+        parser.error(str(e))
+    results = suite.run()
+    suite.save_results(filename=args.output)
+    for run in results["runs"]:
+        for stage, measurement in run["stages"].items():
+            print("{:>12} rows {:>20}: {:10.3f} s, peak memory: {} kB".format(
+                run["rows"], stage, measurement["time_sec"], measurement["peak_memory_kb"]))
+    for stage, steps in results["scaling"].items():
+        for step in steps:
+            if step["super_linear"]:
+                print("Stage {} scales super-linearly from {} to {} rows (exponent {:.2f}).".format(
+                    stage, step["from_rows"], step["to_rows"], step["exponent"]))
+    if baseline is not None:
+        for difference in BenchmarkSuite.compare_results(baseline=baseline, results=results,
+                                                         tolerance=args.tolerance):
+            print("Stage {} on {} rows took {:.3f} s instead of {:.3f} s ({:+.0%}).".format(
+                difference["stage"], difference["rows"], difference["time_sec"], difference["baseline_time_sec"],
+                difference["ratio"] - 1))
+    print("Results saved to {}.".format(args.output))
+    return 0
+
+
+def _parse_sizes(value):
+    sizes = list()
+    for size in value.split(","):
+        multiplier = 1
+        if size[-1:] in ("k", "K"):
+            multiplier, size = 1000, size[:-1]
+        elif size[-1:] in ("m", "M"):
+            multiplier, size = 1000000, size[:-1]
+        try:
+            sizes.append(int(float(size) * multiplier))
+        except ValueError:
+            raise argparse.ArgumentTypeError("sizes must be numbers of rows, got: {}".format(value))
+    if any(size <= 0 for size in sizes):
+        raise argparse.ArgumentTypeError("sizes must be positive, got: {}".format(value))
+    return sizes
+
+
+def _parse_stages(value):
+    stages = value.split(",")
+    for stage in stages:
+        if stage not in BenchmarkSuite.STAGES:
+            raise argparse.ArgumentTypeError("unknown stage: {}".format(stage))
+    return stages
+
+
+if __name__ == "__main__":
+    sys.exit(traffic_log_benchmark(arguments=sys.argv[1:]))
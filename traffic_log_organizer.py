@@ -1,7 +1,16 @@
+import argparse
+import sys
+
+from app.batch_pipeline import BatchPipeline
+from app.binary_log import BinaryLog
+from app.binary_log_converter import BinaryLogConverter
+from app.instrumentation import Instrumentation
+from app.log_follower import LogFollower
 from app.log_organizer import LogOrganizer, LogOrganizerDataExporter
 from app.log_splitter import LogSplitter, LogSplitterDateConverter
 from app.impulse_calculator import ImpulseCalculator
 from app.coincidence_calculator import CoincidenceCalculator
+from app.parsed_data_cache import ParsedDataCache
 
 
 def traffic_log_organizer():
@@ -13,7 +22,8 @@ def traffic_log_organizer():
               "Files organized in this way can then be split into smaller files:\nby constant time interval (for "
               "example, daily or weekly logs),\nby specific dates (for example, from 01-01-2016 to 05-25-2016).\n"
               "Impulse data can be calculated from processed logs, and coincidences of impulses from other nodes.\n")
-        print("Do you want to organize (o), split (s), calculate impulses (i), or coincidences? (o/s/i/c): ")
+        print("Do you want to organize (o), split (s), calculate impulses (i), coincidences (c), follow live log (f), "
+              "or convert between CSV and binary logs (b)? (o/s/i/c/f/b): ")
         while True:
             organize_or_split = input()
             if organize_or_split == "o":
@@ -28,6 +38,12 @@ def traffic_log_organizer():
             elif organize_or_split == "c":
                 _calculate_coincidences()
                 break
+            elif organize_or_split == "f":
+                _follow_log()
+                break
+            elif organize_or_split == "b":
+                _convert_log()
+                break
             else:
                 print("Incorrect option. Try again (o/s): ")
         print("Do you want to use Traffic Log Organizer again? (y/n): ")
@@ -43,8 +59,9 @@ def _organize_data():
     while True:
         try:
             print("Enter time interval in seconds:\n300 - 5 minutes\n1800 - 30 minutes\n7200 - 2 hours\n86400 - 1 day\n"
-                  "604800 - 1 week\n2592000 - 1 month\n31536000 - 1 year\nEnter interval: ")
-            interval = int(input())
+                  "604800 - 1 week\n2592000 - 1 month\n31536000 - 1 year\n"
+                  "Several intervals can be separated by commas (for example, 300,1800,7200).\nEnter interval: ")
+            intervals = [int(interval) for interval in input().split(",")]
         except ValueError:
             print("Time interval must be integer.")
         else:
@@ -52,12 +69,21 @@ def _organize_data():
     print("Enter node name: ")
     node = input()
     node = node
-    print('After finishing, file will be found in data/{} folder as "log_organized_{}.csv".'.format(node + "/",
-                                                                                                    interval))
+    print("Do you want to append only new raw entries to previously organized logs? (y/n): ")
+    incremental = input() == "y"
+    for interval in intervals:
+        print('After finishing, file will be found in data/{} folder as "log_organized_{}.csv".'.format(node + "/",
+                                                                                                        interval))
     organizer = LogOrganizer()
     try:
-        organizer.organize_log(filename=file, time_interval_sec=interval, node_name=node)
-        LogOrganizerDataExporter.export_data(log_organizer=organizer)
+        if incremental:
+            for interval in intervals:
+                organizer.organize_log_incremental(filename=file, time_interval_sec=interval, node_name=node)
+        elif len(intervals) > 1:
+            organizer.organize_log_intervals(filename=file, time_intervals_sec=intervals, node_name=node)
+        else:
+            organizer.organize_log(filename=file, time_interval_sec=intervals[0], node_name=node)
+            LogOrganizerDataExporter.export_data(log_organizer=organizer)
     except LogOrganizer.LogOrganizerError as e:
         print("An error occurred while organizing log: {}".format(e))
 
@@ -99,9 +125,12 @@ def _split_by_time_interval(file, print_averages):
         print("Time interval must be integer.")
     print('After finishing, files will be found in /data/t_x folder as "log_x_y.csv",\nwhere x is time interval, y '
           'is file number.')
-    splitter = LogSplitter(data_file=file, print_avg_and_max=print_averages, first_column_avg=2, last_column_avg=3,
-                           first_column_max=4, last_column_max=5)
-    splitter.split_log(time_interval_in_seconds=interval)
+    try:
+        splitter = LogSplitter(data_file=file, print_avg_and_max=print_averages, first_column_avg=2, last_column_avg=3,
+                               first_column_max=4, last_column_max=5)
+        splitter.split_log(time_interval_in_seconds=interval)
+    except LogSplitter.LogSplitterError as e:
+        print("An error occurred while splitting log: {}".format(e))
 
 
 def _split_by_date(file, print_averages):
@@ -112,9 +141,12 @@ def _split_by_date(file, print_averages):
     last_date = input()
     last_date = LogSplitterDateConverter.convert_date(date=last_date)
     print('After finishing, file will be found in data folder as "log_from_x_to_y.csv", where x and y are dates.')
-    splitter = LogSplitter(data_file=file, print_avg_and_max=print_averages, first_column_avg=2, last_column_avg=3,
-                           first_column_max=4, last_column_max=5)
-    splitter.split_log(start_date=first_date, end_date=last_date)
+    try:
+        splitter = LogSplitter(data_file=file, print_avg_and_max=print_averages, first_column_avg=2, last_column_avg=3,
+                               first_column_max=4, last_column_max=5)
+        splitter.split_log(start_date=first_date, end_date=last_date)
+    except LogSplitter.LogSplitterError as e:
+        print("An error occurred while splitting log: {}".format(e))
 
 
 def _calculate_impulses():
@@ -122,24 +154,190 @@ def _calculate_impulses():
     path = input()
     print('After finishing, files will be found in {} folder, ending with "impulse.csv".'.format(path))
     calculator = ImpulseCalculator()
-    calculator.calculate_impulses_in_directory(file_path=path)
-    calculator.parse_impulse_data_in_directory(file_path=path)
+    try:
+        calculator.calculate_impulses_in_directory(file_path=path)
+        calculator.parse_impulse_data_in_directory(file_path=path)
+    except ImpulseCalculator.ImpulseCalculatorError as e:
+        print("An error occurred while calculating impulses: {}".format(e))
 
 
 def _calculate_coincidences():
-    print("Enter path with impulse logs of first node to calculate coincidences for: ")
-    node_a = input()
-    print("Enter path with impulse logs of second node to calculate coincidences with: ")
-    node_b = input()
+    print("Enter path with impulse logs of first node to calculate coincidences for\n(or several paths separated by "
+          "commas to calculate coincidences between all of them): ")
+    nodes = input().split(",")
+    if len(nodes) == 1:
+        print("Enter path with impulse logs of second node to calculate coincidences with: ")
+        nodes.append(input())
+        all_pairs = False
+    else:
+        all_pairs = True
     print("Enter time interval (in seconds) of logs impulse logs were based on:\n300 - 5 minutes\n1800 - 30 minutes\n"
           "7200 - 2 hours\n86400 - 1 day\n604800 - 1 week\n2592000 - 1 month\n31536000 - 1 year\nEnter interval: ")
     interval = int(input())
+    print('Do you want to cache parsed impulse logs next to them (as "{}" files) to speed up later runs? (y/n): '
+          .format(ParsedDataCache.EXTENSION))
+    cache = ParsedDataCache() if input() == "y" else None
     print('After finishing, files will be found in {} folder, with name starting as "coincidence_with_node".'
-          .format(node_a))
-    coincidence_calculator = CoincidenceCalculator()
-    coincidence_calculator.calculate_coincidences(file_path_node_a=node_a, file_path_node_b=node_b,
-                                                  time_interval=interval)
+          .format(nodes[0]))
+    try:
+        if all_pairs:
+            coincidence_calculator = CoincidenceCalculator(workers=None, cache=cache)
+            coincidence_calculator.calculate_coincidence_matrix(file_paths=nodes, time_interval=interval)
+        else:
+            coincidence_calculator = CoincidenceCalculator(cache=cache)
+            coincidence_calculator.calculate_coincidences(file_path_node_a=nodes[0], file_path_node_b=nodes[1],
+                                                          time_interval=interval)
+    except CoincidenceCalculator.CoincidenceCalculatorError as e:
+        print("An error occurred while calculating coincidences: {}".format(e))
+
+
+def _follow_log():
+    print("Enter path and file name of live raw log to follow: ")
+    file = input()
+    while True:
+        try:
+            print("Enter time interval in seconds: ")
+            interval = int(input())
+        except ValueError:
+            print("Time interval must be integer.")
+        else:
+            break
+    print("Enter node name: ")
+    node = input()
+    print('Organized entries will be appended to data/{}/log_organized_{}.csv and impulses written to "{}".\n'
+          'Press Ctrl+C to stop following.'.format(node, interval,
+                                                    LogFollower.get_impulse_file_name(node_name=node,
+                                                                                      time_interval_sec=interval)))
+    follower = LogFollower()
+    try:
+        follower.follow_log(filename=file, node_name=node, time_interval_sec=interval)
+    except KeyboardInterrupt:
+        pass
+    except LogOrganizer.LogOrganizerError as e:
+        print("An error occurred while following log: {}".format(e))
+
+
+def _convert_log():
+    print("Enter path and file name of CSV or binary log to convert: ")
+    file = input()
+    try:
+        if BinaryLog.is_binary_log(filename=file):
+            converted_file = BinaryLogConverter.convert_to_csv(binary_filename=file)
+        else:
+            converted_file = BinaryLogConverter.convert_to_binary(filename=file)
+    except BinaryLogConverter.BinaryLogConverterError as e:
+        print("An error occurred while converting log: {}".format(e))
+    else:
+        print('Converted log can be found in "{}".'.format(converted_file))
+
+
+def batch_traffic_log_organizer(arguments):
+    parser = argparse.ArgumentParser(prog="traffic_log_organizer.py", fromfile_prefix_chars="@",
+                                     description="Organize, split and calculate impulses and coincidences for raw "
+                                                 "logs of several nodes without interaction. Arguments can be read "
+                                                 "from file given as @file, one per line.")
+    parser.add_argument("nodes", nargs="+", type=_parse_node, metavar="NODE=RAW_LOG[,RAW_LOG...]",
+                        help="node name and path of its raw log, several comma separated raw logs are merged by date")
+    parser.add_argument("-i", "--intervals", required=True, type=_parse_intervals,
+                        help="comma separated time intervals in seconds to organize logs with")
+    split_group = parser.add_mutually_exclusive_group()
+    split_group.add_argument("--split-interval", type=int,
+                             help="split log organized with shortest interval by this time interval in seconds")
+    split_group.add_argument("--split-dates", nargs=2, type=_parse_date, metavar=("FIRST_DATE", "LAST_DATE"),
+                             help="split log organized with shortest interval by dates in D-M-YYYY format")
+    parser.add_argument("--impulses", action="store_true", help="calculate impulses for split logs")
+    parser.add_argument("--coincidences", action="store_true",
+                        help="calculate impulses and coincidences between all nodes")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="number of processes to run nodes on, 0 uses all processors")
+    parser.add_argument("--compress-split-logs", choices=("gz", "bz2", "xz"),
+                        help="write split logs compressed with given format")
+    parser.add_argument("--compression-level", type=int, choices=range(0, 10), metavar="0-9",
+                        help="compression level of compressed outputs")
+    parser.add_argument("--compression-buffer-size", type=int,
+                        help="buffer size in bytes used when reading and writing compressed files")
+    parser.add_argument("--binary-split-logs", action="store_true",
+                        help="write split logs in binary columnar format instead of CSV")
+    parser.add_argument("--no-fsync", action="store_true",
+                        help="don't flush written files to disk before moving them into place")
+    parser.add_argument("--split-percentiles", type=_parse_percentiles, default=tuple(), metavar="PERCENTILES",
+                        help="comma separated throughput percentiles to add to split log footers, e.g. 95,99")
+    parser.add_argument("--sort-raw-logs", action="store_true",
+                        help="sort raw logs by date and remove duplicated dates before organizing them")
+    parser.add_argument("--sort-memory", type=int, metavar="MB",
+                        help="memory in megabytes used to sort raw logs before spilling sorted chunks to disk")
+    parser.add_argument("--instrumentation-report", metavar="FILE",
+                        help="measure time, rows and bytes of every stage and save them to JSON file")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="trace peak memory of every stage in instrumentation report")
+    parser.add_argument("--profile-stage", action="append", default=list(), metavar="STAGE",
+                        help="profile functions of given stage in instrumentation report, can be repeated")
+    parser.add_argument("--profile-directory", help="directory to save profiles of profiled stages to")
+    args = parser.parse_args(arguments)
+    if (args.trace_memory or args.profile_stage or args.profile_directory) and args.instrumentation_report is None:
+        parser.error("memory tracing and profiling require --instrumentation-report")
+    if args.sort_memory is not None and args.sort_memory <= 0:
+        parser.error("memory used to sort raw logs must be positive")
+    if args.instrumentation_report is not None:
+        Instrumentation.configure(trace_memory=args.trace_memory, profiled_stages=args.profile_stage,
+                                  profile_directory=args.profile_directory)
+    try:
+        pipeline = BatchPipeline(organize_intervals=args.intervals, split_interval=args.split_interval,
+                                 split_dates=args.split_dates, impulses=args.impulses, coincidences=args.coincidences,
+                                 workers=args.workers if args.workers > 0 else None,
+                                 compression=args.compress_split_logs, compression_level=args.compression_level,
+                                 compression_buffer_size=args.compression_buffer_size, binary=args.binary_split_logs,
+                                 fsync=not args.no_fsync, sort_raw_logs=args.sort_raw_logs,
+                                 sort_memory_budget=args.sort_memory * 1024 * 1024 if args.sort_memory else None,
+                                 split_percentiles=args.split_percentiles)
+        exit_code = pipeline.run(nodes=args.nodes)
+    except BatchPipeline.BatchPipelineError as e:
+        parser.error(str(e))
+    for name, error in pipeline.failures.items():
+        print("An error occurred while processing {}: {}".format(name, error), file=sys.stderr)
+    if args.instrumentation_report is not None:
+        Instrumentation.save_report(filename=args.instrumentation_report)
+    return exit_code
+
+
+def _parse_node(value):
+    node, separator, file = value.partition("=")
+    if not separator or not node or not file:
+        raise argparse.ArgumentTypeError("node must be given as NODE=RAW_LOG, got: {}".format(value))
+    files = file.split(",")
+    if not all(files):
+        raise argparse.ArgumentTypeError("raw logs must be separated by single commas, got: {}".format(value))
+    return node, files[0] if len(files) == 1 else files
+
+
+def _parse_intervals(value):
+    try:
+        intervals = [int(interval) for interval in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("time intervals must be integers, got: {}".format(value))
+    if any(interval <= 0 for interval in intervals):
+        raise argparse.ArgumentTypeError("time intervals must be positive, got: {}".format(value))
+    return intervals
+
+
+def _parse_percentiles(value):
+    try:
+        percentiles = tuple(float(percentile) for percentile in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("percentiles must be numbers, got: {}".format(value))
+    if any(not 0 < percentile < 100 for percentile in percentiles):
+        raise argparse.ArgumentTypeError("percentiles must be between 0 and 100, got: {}".format(value))
+    return percentiles
+
+
+def _parse_date(value):
+    try:
+        return LogSplitterDateConverter.convert_date(date=value)
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError("date must be in D-M-YYYY format, got: {}".format(value))
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(batch_traffic_log_organizer(arguments=sys.argv[1:]))
     traffic_log_organizer()